@@ -0,0 +1,203 @@
+# Ticket analytics for the Sales Lead Tracker
+# Status history parsed from Notes, stage durations and dwell-time aggregates
+
+import sys
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# History lines are written as "[YYYY-MM-DD HH:MM] Status → X" (see status_change_fields in app.py)
+HISTORY_PATTERN = r"\[(?P<timestamp>.*?)\] Status → (?P<status>.*?)\n"
+
+def status_events(df):
+    """Tidy table of every status transition recorded in Notes: SubmissionID, timestamp, status.
+
+    Rows come out grouped by ticket in frame order and sorted by time within a
+    ticket; ``pos`` is the ticket's position in ``df``.
+    """
+    empty = pd.DataFrame({"pos": pd.Series(dtype="int64"), "SubmissionID": pd.Series(dtype=object),
+                          "timestamp": pd.Series(dtype="datetime64[ns, UTC]"), "status": pd.Series(dtype=object)})
+    if df.empty or "Notes" not in df.columns: return empty
+    notes = df["Notes"].where(df["Notes"].notna() & (df["Notes"] != ""), "").astype(str).reset_index(drop=True)
+    events = notes.str.extractall(HISTORY_PATTERN)
+    if events.empty: return empty
+    events.index.names = ["pos", "match"]
+    events = events.reset_index()
+    events["timestamp"] = pd.to_datetime(events["timestamp"], utc=True, errors="coerce")
+    events = events.dropna(subset=["timestamp"]).sort_values(["pos", "timestamp", "match"], kind="stable")
+    events["SubmissionID"] = df["SubmissionID"].to_numpy()[events["pos"].to_numpy()]
+    return events[["pos", "SubmissionID", "timestamp", "status"]].reset_index(drop=True)
+
+def status_durations(df, now=None):
+    """Days spent in each status per ticket: SubmissionID, Name, Status, Duration (Days).
+
+    Each ticket starts at CreatedAt in the status of its earliest recorded
+    transition (or its current Status when it has none); the last stage runs
+    until ``now``.
+    """
+    columns = ["SubmissionID", "Name", "Status", "Duration (Days)"]
+    if df.empty: return pd.DataFrame(columns=columns)
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    events = status_events(df)
+    base = df.reset_index(drop=True)
+    has_history = base.index.isin(events["pos"])
+    first_status = events.groupby("pos")["status"].first().reindex(base.index)
+    initial = pd.DataFrame({"pos": base.index, "SubmissionID": base["SubmissionID"], "timestamp": pd.to_datetime(base["CreatedAt"], utc=True),
+                            "status": first_status.where(has_history, base["Status"])})
+    initial["seq"] = 0; events["seq"] = 1
+    timeline = pd.concat([initial, events], ignore_index=True).sort_values(["pos", "seq"], kind="stable")
+    end = timeline.groupby("pos")["timestamp"].shift(-1).fillna(now)
+    timeline["Duration (Days)"] = (end - timeline["timestamp"]).dt.total_seconds() / (3600 * 24)
+    timeline["Name"] = base["Name"].to_numpy()[timeline["pos"].to_numpy()]
+    return timeline.rename(columns={"status": "Status"})[columns].reset_index(drop=True)
+
+def dwell_time_stats(durations):
+    """Median and p90 days per status, in STATUS_LIST order, for charting."""
+    if durations.empty: return pd.DataFrame(columns=["Status", "Median (Days)", "P90 (Days)", "Stages"])
+    grouped = durations.groupby("Status")["Duration (Days)"]
+    stats = pd.DataFrame({"Median (Days)": grouped.median(), "P90 (Days)": grouped.quantile(0.9), "Stages": grouped.size()})
+    order = [s for s in config.STATUS_LIST if s in stats.index] + [s for s in stats.index if s not in config.STATUS_LIST]
+    return stats.loc[order].rename_axis("Status").reset_index()
+
+# --- MATERIALIZED KPI AGGREGATES ---
+DIMENSIONS = ["Status", "ContactSource", "AssignedTo", "TypeOfService"]
+BUCKET_KEY = ["Day", *DIMENSIONS]
+BUCKET_VALUES = ["Tickets", "DurationSum", "DurationCount"]
+
+DAY_NS = 86_400_000_000_000
+
+def _value(v):
+    # groupby(dropna=False) yields NaN for a missing dimension, single rows yield None: use None for both
+    return None if pd.isna(v) else v
+
+def _contributions(df):
+    # One row per ticket: its bucket key (Day as days since the epoch, UTC) and what it adds to the bucket
+    day = pd.to_datetime(df["CreatedAt"], utc=True)
+    df = df[day.notna()]; day = day[day.notna()]
+    out = pd.DataFrame({"Day": day.dt.tz_convert(None).astype("datetime64[ns]").astype("int64") // DAY_NS})
+    for col in DIMENSIONS:
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        out[col] = values.astype(object).where(values.notna(), None)
+    if {"InstalledDate", "SurveyScheduledDate"} <= set(df.columns):
+        days = (df["InstalledDate"] - df["SurveyScheduledDate"]).dt.days
+    else:
+        days = pd.Series(float("nan"), index=df.index)
+    out["Tickets"] = 1; out["DurationSum"] = days.fillna(0); out["DurationCount"] = days.notna().astype(int)
+    return out
+
+def _row_contribution(row):
+    # _contributions for one ticket (a row dict): (day, dimension values, bucket values), or None without a created day
+    created = pd.to_datetime(row.get("CreatedAt"), utc=True)
+    if pd.isna(created): return None
+    days = pd.NaT
+    if row.get("InstalledDate") is not None and row.get("SurveyScheduledDate") is not None:
+        days = pd.Timestamp(row["InstalledDate"]) - pd.Timestamp(row["SurveyScheduledDate"])
+    return created.value // DAY_NS, [_value(row.get(col)) for col in DIMENSIONS], (1, 0 if pd.isna(days) else days.days, 0 if pd.isna(days) else 1)
+
+def _day(ts):
+    ts = pd.Timestamp(ts)
+    ns = (ts if ts.tzinfo is not None else ts.tz_localize("UTC")).value
+    return -(-ns // DAY_NS)  # first whole day at or after ts; buckets start at midnight UTC
+
+class KpiAggregates:
+    """Ticket counts and survey-to-install duration sums in daily buckets.
+
+    Buckets are keyed by created day (UTC) and DIMENSIONS, so any date range or
+    dimension filter is answered from the buckets instead of the ticket frame.
+    They live in growable arrays, with each dimension stored as integer codes,
+    and a key -> row map: ``update`` moves one ticket between buckets by
+    adjusting two rows in place (appending a row for a new key), so a change
+    never rebuilds the buckets, and ``query`` counts with ``np.bincount``.
+    Emptied buckets stay as zero rows. Updates and queries may come from
+    different threads and take the same lock.
+    """
+
+    def __init__(self, df):
+        contrib = _contributions(df)
+        self._labels = {}  # dimension -> values by code (None included)
+        self._codes = {}  # dimension -> value -> code
+        for col in DIMENSIONS:
+            codes, uniques = pd.factorize(contrib[col], use_na_sentinel=False)
+            self._labels[col] = [_value(v) for v in uniques]; self._codes[col] = {v: i for i, v in enumerate(self._labels[col])}
+            contrib[col] = codes
+        grouped = contrib.groupby(BUCKET_KEY, sort=False)[BUCKET_VALUES].sum().reset_index()
+        n = len(grouped); capacity = max(64, 2 * n)
+        self._key = np.zeros((capacity, len(BUCKET_KEY)), dtype="int64")
+        self._values = np.zeros((capacity, len(BUCKET_VALUES)), dtype="int64")
+        self._key[:n] = grouped[BUCKET_KEY].to_numpy(); self._values[:n] = grouped[BUCKET_VALUES].to_numpy()
+        self._rows = {key: i for i, key in enumerate(map(tuple, self._key[:n].tolist()))}
+        self._size = n
+        self._lock = threading.Lock()
+
+    def _code(self, col, value):
+        code = self._codes[col].get(value)
+        if code is None:
+            code = self._codes[col][value] = len(self._labels[col]); self._labels[col].append(value)
+        return code
+
+    def _row(self, key):
+        i = self._rows.get(key)
+        if i is not None: return i
+        i = self._size
+        if i == len(self._key):
+            self._key = np.concatenate([self._key, np.zeros_like(self._key)])
+            self._values = np.concatenate([self._values, np.zeros_like(self._values)])
+        self._key[i] = key; self._rows[key] = i; self._size += 1
+        return i
+
+    def _add(self, row, sign):
+        contribution = _row_contribution(row)
+        if contribution is None: return
+        day, values, amounts = contribution
+        key = (day, *(self._code(col, v) for col, v in zip(DIMENSIONS, values)))
+        self._values[self._row(key)] += sign * np.asarray(amounts, dtype="int64")
+
+    def update(self, old=None, new=None):
+        """Move one ticket between buckets; ``old``/``new`` are row dicts (None for insert/delete)."""
+        with self._lock:
+            if old is not None: self._add(old, -1)
+            if new is not None: self._add(new, 1)
+
+    def memory_usage(self):
+        with self._lock:
+            labels = sum(sys.getsizeof(v) for values in self._labels.values() for v in values)
+            return self._key.nbytes + self._values.nbytes + labels + sys.getsizeof(self._rows)
+
+    def _counts(self, col, codes, tickets):
+        labels = self._labels[col]
+        counts = pd.Series(np.bincount(codes, weights=tickets, minlength=len(labels)).astype("int64"), index=pd.Index(labels, dtype=object, name=col), name="Tickets")
+        return counts[(counts > 0) & counts.index.notna()].sort_values(ascending=False)
+
+    def query(self, start=None, end=None, **filters):
+        """KPIs for tickets created in [start, end) matching ``filters`` (e.g. AssignedTo="Jane")."""
+        with self._lock:
+            n = self._size; key = self._key[:n]; tickets = self._values[:n, 0]
+            mask = tickets > 0
+            if start is not None: mask &= key[:, 0] >= _day(start)
+            if end is not None: mask &= key[:, 0] < _day(end)
+            for col, value in filters.items():
+                code = self._codes[col].get(value)
+                mask &= key[:, BUCKET_KEY.index(col)] == (-1 if code is None else code)
+            rows = np.flatnonzero(mask)
+            key = key[rows]; values = self._values[rows]
+            status_counts = self._counts("Status", key[:, BUCKET_KEY.index("Status")], values[:, 0])
+            source_counts = self._counts("ContactSource", key[:, BUCKET_KEY.index("ContactSource")], values[:, 0])
+        if len(rows):
+            first = int(key[:, 0].min())
+            counts = np.bincount(key[:, 0] - first, weights=values[:, 0]).astype("int64")
+            daily = pd.Series(counts, index=pd.date_range(pd.Timestamp(first * DAY_NS, tz="UTC"), periods=len(counts), freq="D"), name="Tickets")
+        else:
+            daily = pd.Series(dtype="int64", index=pd.DatetimeIndex([], tz="UTC", name="Day"), name="Tickets")
+        duration_count = int(values[:, 2].sum())
+        return {
+            "total": int(values[:, 0].sum()),
+            "status_counts": status_counts,
+            "source_counts": source_counts,
+            "daily": daily,
+            "installed": int(status_counts.get("Installed", 0)), "lost": int(status_counts.get("Lost", 0)),
+            "avg_duration": values[:, 1].sum() / duration_count if duration_count else None,
+        }
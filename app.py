@@ -5,8 +5,24 @@ import pandas as pd
 from datetime import datetime, timezone, timedelta, date
 import requests
 import config # Import the config file
+import functools
+import inspect
 import re
+import sys
+import time
+import types
+import uuid
+from collections import OrderedDict
+import numpy as np
 import plotly.express as px
+from streamlit.runtime.scriptrunner import RerunException, StopException
+import analytics
+import exports
+import jotform
+import outbox
+import store
+import tickets
+import tracing
 
 # --- CONSTANTS ---
 st.set_page_config(page_title="Pioneer Sales Lead App", page_icon="📶", layout="wide")
@@ -28,64 +44,61 @@ STATUS_TO_DATE_FIELD = {
     "Scheduled": "scheduled_date", "Installed": "installed_date",
     "Waiting on Customer": "waiting_on_customer_date",
 }
+SECTIONS = ["✅ Tasks", "🧩 Pipeline View","📋 All Tickets","➕ Add Ticket","✏️ Edit Ticket","📈 KPI"]
+PIPELINE_PAGE = 15  # cards shown per Pipeline column before "Load more"
+# Date fields that are also columns of the ticket frame
+DATE_FIELD_COLUMNS = {"survey_scheduled_date": "SurveyScheduledDate", "installed_date": "InstalledDate"}
 # -----------------
 
 # --- JOTFORM API FUNCTIONS and HELPERS ---
-@st.cache_data(ttl=300)
+@st.cache_resource
+def get_ticket_store():
+    return store.TicketStore(config.STORE_PATH)
+
 def get_jotform_submissions():
-    try:
-        api_key = st.secrets["JOTFORM_API_KEY"]
-        form_id = st.secrets["JOTFORM_FORM_ID"]
-        url = f"https://api.jotform.com/form/{form_id}/submissions?apiKey={api_key}&limit=1000"
-        
-        response = requests.get(url); response.raise_for_status()
-        data = response.json().get('content', [])
-        records = []
-        for sub in data:
-            if sub.get('status') == 'ACTIVE':
-                answers = sub.get('answers', {})
-                def get_ans(qid):
-                    ans_dict = answers.get(str(qid)); return ans_dict.get('answer', '') if ans_dict else ''
-                def get_date_ans(qid):
-                    date_ans = get_ans(qid)
-                    if isinstance(date_ans, dict):
-                        date_str = f"{date_ans.get('year')}-{date_ans.get('month')}-{date_ans.get('day')}"
-                        return pd.to_datetime(date_str, errors='coerce')
-                    return pd.to_datetime(date_ans, errors='coerce')
-                name_field_str = config.FIELD_ID.get('name_first', ''); name_id_match = re.search(r'\d+', name_field_str)
-                first_name, last_name = '', ''
-                if name_id_match:
-                    name_id = name_id_match.group(); name_ans = get_ans(name_id)
-                    first_name = name_ans.get('first', '') if isinstance(name_ans, dict) else ''
-                    last_name = name_ans.get('last', '') if isinstance(name_ans, dict) else ''
-                records.append({
-                    "SubmissionID": sub.get('id'), "Name": f"{first_name} {last_name}".strip(),
-                    "AssignedTo": get_ans(config.FIELD_ID['assigned_to']), "ContactSource": get_ans(config.FIELD_ID['source']),
-                    "Status": get_ans(config.FIELD_ID['status']), "TypeOfService": get_ans(config.FIELD_ID['service_type']),
-                    "LostReason": get_ans(config.FIELD_ID['lost_reason']), "Notes": get_ans(config.FIELD_ID['notes']),
-                    "CreatedAt": pd.to_datetime(sub.get('created_at'), utc=True),
-                    "LastUpdated": pd.to_datetime(sub.get('updated_at'), utc=True) if sub.get('updated_at') else pd.to_datetime(sub.get('created_at'), utc=True),
-                    "SurveyScheduledDate": get_date_ans(config.FIELD_ID['survey_scheduled_date']),
-                    "InstalledDate": get_date_ans(config.FIELD_ID['installed_date']),
-                    "NextActionDate": get_date_ans(config.FIELD_ID['next_action_date']),
-                    "NextAction": get_ans(config.FIELD_ID['next_action']),
-                })
-        df = pd.DataFrame(records)
-        for col in ["SubmissionID", "Name", "Status", "CreatedAt", "AssignedTo", "NextActionDate"]:
-            if col not in df.columns:
-                df[col] = pd.Series(dtype='object' if 'Date' not in col else 'datetime64[ns]')
-        return df
-    except Exception as e:
-        st.error(f"An error occurred while processing JotForm data: {e}"); return pd.DataFrame()
+    # First load: the saved tickets, so a restart serves at once; only an empty store waits for a download
+    ticket_store = get_ticket_store()
+    if ticket_store.is_empty():
+        try:
+            with tracing.span("sync") as span: span.set(**ticket_store.sync(*jotform_readers()))
+        except Exception as e:
+            st.error(f"An error occurred while processing JotForm data: {e}"); return pd.DataFrame()
+    with tracing.span("store load") as span:
+        df = ticket_store.load(); span.set(rows=len(df))
+    return df
+
+def jotform_readers():
+    # fetch/parse pair for TicketStore.sync
+    form_id = st.secrets["JOTFORM_FORM_ID"]; client = get_jotform_client()
+    def fetch(params):
+        with tracing.span("fetch", delta=params is not None) as span:
+            subs, pages = client.fetch_submissions(form_id, params=params)
+            span.set(rows=len(subs), pages=len(pages), bytes=sum(p["bytes"] for p in pages))
+            tracing.count("rows fetched", len(subs))
+            return subs
+    def parse(subs):
+        with tracing.span("parse", rows=len(subs)):
+            tracing.count("rows parsed", len(subs))
+            return jotform.normalize_submissions(subs, config.FIELD_ID)
+    return fetch, parse
+
+def jotform_sync():
+    # TicketCache refresh: pull JotForm changes into the store and hand the changed rows to the cache.
+    # Runs on the cache's refresh thread, so everything from st.* is resolved here first
+    ticket_store = get_ticket_store(); fetch, parse = jotform_readers()
+    def sync(live):
+        with tracing.span("sync") as span: span.set(**ticket_store.sync(fetch, parse, apply=live.merge))
+    return sync
+
+@st.cache_resource
+def get_jotform_client():
+    # JOTFORM_BASE_URL points the app at another server, e.g. mock_jotform.py for local testing
+    return jotform.JotFormClient(st.secrets["JOTFORM_API_KEY"], base_url=st.secrets.get("JOTFORM_BASE_URL", jotform.BASE_URL))
 
 def api_request(method, url_suffix, payload=None):
     try:
-        api_key = st.secrets["JOTFORM_API_KEY"]
-        base_url = "https://api.jotform.com"
-        url = f"{base_url}/{url_suffix}?apiKey={api_key}"
-        response = requests.request(method, url, data=payload)
-        response.raise_for_status()
-        return True
+        response = get_jotform_client().request(method, url_suffix, data=payload)
+        return response.json() if response.content else {"responseCode": response.status_code}
     except requests.exceptions.RequestException as e:
         st.error(f"API Request Failed: {e}"); return False
 
@@ -97,64 +110,244 @@ def add_jotform_submission(payload):
 def delete_jotform_submission(submission_id):
     return api_request('DELETE', f"submission/{submission_id}")
 
+@st.cache_resource
+def get_outbox():
+    # Write-behind queue: edits are saved to disk at once and sent to JotForm by a background worker
+    live = get_live_tickets(); client = get_jotform_client(); form_id = st.secrets["JOTFORM_FORM_ID"]
+    def send(kind, sid, payload):
+        if kind == "add": return client.add_submission(form_id, payload)
+        return client.update_submission(sid, payload)
+    box = outbox.Outbox(config.OUTBOX_PATH, send, lambda *settled: outbox.settle(live, box, *settled))
+    # Writes replayed after a restart go back on the shared frame (and show as pending) until JotForm has them
+    live.get(get_jotform_submissions, jotform_sync())
+    for entry in list(box.pending.values()):
+        sid = box.id_map.get(entry["sid"], entry["sid"]); changes = stored_changes(entry.get("changes"))
+        if entry["kind"] == "add": live.insert(sid, changes)
+        elif changes: live.patch(sid, changes)
+    return box.start()
+def stored_changes(changes):
+    # Frame changes read back from the outbox file: timestamps were written as text
+    return {col: pd.Timestamp(v) if col in store.UTC_COLUMNS + store.DATE_COLUMNS and isinstance(v, str) else v for col, v in (changes or {}).items()}
+
+@st.cache_resource
+def get_live_tickets():
+    return tickets.TicketCache(ttl=300)
+def get_tickets():
+    live = get_live_tickets(); loaded_at = live.loaded_at
+    with tracing.span("tickets") as span:
+        df = live.get(get_jotform_submissions, jotform_sync())
+        hit = live.loaded_at == loaded_at; span.set(cache="hit" if hit else "miss", rows=len(df))
+    tracing.count("ticket cache hit" if hit else "ticket cache miss")
+    if live.sync_error is not None and not df.empty: st.warning(f"Could not sync with JotForm, showing saved tickets: {live.sync_error}")
+    return df
+@st.cache_resource
+def get_tracer():
+    return tracing.configure(config.TRACE_LOG, config.TRACE_ENABLED)
 def refresh_data():
-    st.cache_data.clear(); st.rerun()
+    # Sync now in this session (other sessions keep reading meanwhile) rather than waiting for the background refresh
+    live = get_live_tickets(); live.refresh(jotform_sync())
+    if live.sync_error is not None: st.warning(f"Could not sync with JotForm: {live.sync_error}")
+    else: st.cache_data.clear(); st.rerun()
+@st.cache_resource
+def get_session_registry():
+    return {}  # session id -> (last seen, bytes held by that session)
+def value_bytes(value, shared=None, seen=None):
+    # Bytes held by a session_state entry or cached result: frames and arrays by their data, containers and
+    # objects (e.g. figures) by what they reference; ``shared`` (the TicketCache frame) and repeats count once
+    seen = set() if seen is None else seen
+    if value is shared or id(value) in seen: return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame): return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)): return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray): return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict): return size + sum(value_bytes(k, shared, seen) + value_bytes(v, shared, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)): return size + sum(value_bytes(v, shared, seen) for v in value)
+    if hasattr(value, "__dict__") and not isinstance(value, (type, types.ModuleType)): return size + value_bytes(vars(value), shared, seen)
+    return size
+def record_session_memory():
+    # Sessions share the TicketCache frame, so only what a session holds beyond it counts here
+    shared = get_live_tickets().df
+    used = value_bytes(dict(st.session_state.items()), shared)
+    registry = get_session_registry(); now = time.time()
+    registry[st.session_state.setdefault('session_id', uuid.uuid4().hex)] = (now, used)
+    for key, (seen, _) in list(registry.items()):
+        if now - seen > 3600: registry.pop(key, None)
+    return used
+@st.cache_resource
+def get_view_sizes():
+    return {}  # cached view function -> OrderedDict(hashed args -> bytes), newest last, at most max_entries
+def sized_cache(max_entries):
+    # st.cache_resource that also notes each entry's size for the Memory panel when it is built;
+    # the oldest sizes are dropped as the cache's own LRU drops entries
+    def wrap(fn):
+        signature = inspect.signature(fn)
+        @functools.wraps(fn)
+        def build(*args, **kwargs):
+            value = fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            key = tuple(v for k, v in bound.arguments.items() if not k.startswith("_"))
+            sizes = get_view_sizes().setdefault(fn.__name__, OrderedDict())
+            sizes[key] = value_bytes(value, get_live_tickets().df); sizes.move_to_end(key)
+            while len(sizes) > max_entries: sizes.popitem(last=False)
+            return value
+        return st.cache_resource(max_entries=max_entries)(build)
+    return wrap
+def status_change_fields(new_status, notes):
+    # JotForm payload and matching frame changes for a status move: history line + auto-stamped date
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M")
+    new_notes = f"[{timestamp}] Status → {new_status}\n{notes}".strip()
+    payload = {f'submission[{config.FIELD_ID["status"]}]': new_status, f'submission[{config.FIELD_ID["notes"]}]': new_notes}
+    changes = {"Status": new_status, "Notes": new_notes}
+    if new_status in STATUS_TO_DATE_FIELD:
+        date_field_key = STATUS_TO_DATE_FIELD[new_status]; date_field_id = config.FIELD_ID[date_field_key]; now_local = datetime.now()
+        payload.update({f'submission[{date_field_id}][month]': now_local.month, f'submission[{date_field_id}][day]': now_local.day, f'submission[{date_field_id}][year]': now_local.year})
+        if date_field_key in DATE_FIELD_COLUMNS: changes[DATE_FIELD_COLUMNS[date_field_key]] = pd.Timestamp(now_local.date())
+    return payload, changes
+def save_ticket_changes(sid, payload, changes):
+    # Optimistic write: patch the shared frame now and queue the POST; the outbox confirms or rolls back
+    changes = {**changes, "LastUpdated": pd.Timestamp.now(tz="UTC")}
+    if get_live_tickets().patch(sid, changes) is None: return False
+    get_outbox().enqueue("update", sid, payload, user=st.session_state.get('name'), changes=changes); return True
+def create_ticket(payload, row):
+    live = get_live_tickets(); temp_id = f"pending-{uuid.uuid4().hex[:8]}"; now = pd.Timestamp.now(tz="UTC")
+    row = {**row, "CreatedAt": now, "LastUpdated": now}; live.insert(temp_id, row)
+    get_outbox().enqueue("add", temp_id, payload, user=st.session_state.get('name'), changes=row); return True
+def remove_ticket(sid):
+    # A queued edit sent after the delete would fail on the missing ticket, so wait until the outbox has sent it
+    if get_outbox().has_pending(sid):
+        st.warning("This ticket has an edit still being saved to JotForm; try again in a moment."); return False
+    live = get_live_tickets(); removed = live.remove(sid)
+    if delete_jotform_submission(sid):
+        live.confirm(sid); get_ticket_store().delete([sid]); return True
+    live.rollback(sid, removed); return False
+def bulk_update_tickets(sids, action, target=None):
+    # Apply one action to many tickets: optimistic patch, concurrent API calls, per-ticket outcome.
+    # Tickets with queued edits are skipped: the older queued POST would land after this call and undo it
+    live = get_live_tickets(); client = get_jotform_client(); box = get_outbox(); results, jobs, undo = [], [], {}
+    now = pd.Timestamp.now(tz="UTC")
+    for sid in sids:
+        row = live.row(sid)
+        if row is None: results.append((sid, "", "Not found")); continue
+        if not ((st.session_state['role'] == 'admin') or (row['AssignedTo'] == st.session_state['name'])):
+            results.append((sid, row['Name'], "🔒 No permission")); continue
+        if box.has_pending(sid): results.append((sid, row['Name'], "⏳ Edit pending, try again shortly")); continue
+        if action == "Delete": jobs.append((sid, None)); undo[sid] = None
+        elif action == "Move to" and row['Status'] == target: results.append((sid, row['Name'], f"Already in {target}"))
+        elif action == "Move to":
+            payload, changes = status_change_fields(target, row.get('Notes', '')); jobs.append((sid, payload)); undo[sid] = changes
+        elif action == "Reassign to":
+            jobs.append((sid, {f'submission[{config.FIELD_ID["assigned_to"]}]': target})); undo[sid] = {"AssignedTo": target}
+    names = {sid: live.row(sid)['Name'] for sid, _ in jobs}
+    for sid in undo: undo[sid] = live.remove(sid) if action == "Delete" else live.patch(sid, {**undo[sid], "LastUpdated": now})
+    call = (lambda job: client.delete_submission(job[0])) if action == "Delete" else (lambda job: client.update_submission(job[0], job[1]))
+    for (sid, _), _, error in client.run_bulk(call, jobs):
+        if error is None:
+            live.confirm(sid); results.append((sid, names[sid], "✅ Done"))
+            if action == "Delete": get_ticket_store().delete([sid])
+        else:
+            live.rollback(sid, undo[sid]); results.append((sid, names[sid], f"❌ {error}"))
+    return pd.DataFrame(results, columns=["SubmissionID", "Name", "Result"])
 def calculate_status_durations(df):
-    duration_records = []; now = datetime.now(timezone.utc)
-    for _, row in df.iterrows():
-        notes = row.get('Notes', '') or ''; history = re.findall(r'\[(.*?)\] Status → (.*?)\n', notes)
-        events = [{'timestamp': pd.to_datetime(ts_str, utc=True), 'status': status} for ts_str, status in history]
-        events.sort(key=lambda x: x['timestamp'])
-        first_event_timestamp = row['CreatedAt']
-        initial_status = events[0]['status'] if events else row['Status']
-        events.insert(0, {'timestamp': first_event_timestamp, 'status': initial_status})
-        for i in range(len(events)):
-            start_time = events[i]['timestamp']; end_time = events[i+1]['timestamp'] if i + 1 < len(events) else now
-            duration = (end_time - start_time).total_seconds() / (3600 * 24)
-            duration_records.append({'SubmissionID': row['SubmissionID'], 'Name': row['Name'], 'Status': events[i]['status'], 'Duration (Days)': duration})
-    return pd.DataFrame(duration_records)
-def kpi_bar(vdf):
-    parts = [f"**Total Leads:** {len(vdf)}"]
-    for s in STATUS_LIST: parts.append(f"**{s}:** {int((vdf['Status']==s).sum())}")
+    return analytics.status_durations(df)
+def kpi_bar(kpis):
+    parts = [f"**Total Leads:** {kpis['total']}"]
+    for s in STATUS_LIST: parts.append(f"**{s}:** {int(kpis['status_counts'].get(s, 0))}")
     st.markdown(" | ".join(parts))
+# Derived frames and figures are cached per data version (TicketCache.version) and view/filter,
+# so reruns caused by unrelated widgets reuse them instead of recomputing
+@sized_cache(8)
+def ticket_view(version, view_mode, name, _df):
+    return _df[_df['AssignedTo'] == name] if view_mode == "My Tickets" else _df
+@sized_cache(8)
+def search_view(version, view_key, search_key, _view_df):
+    # Tickets of the view matching the search bar and filters, answered from the TicketCache search index
+    query, facets, created = search_key
+    start, end = (list(created) + [None, None])[:2]
+    ids = get_live_tickets().search.search(query, start, end, **dict(facets))
+    return _view_df[_view_df.index.isin(ids)]
+@sized_cache(8)
+def task_groups(version, view_key, today, _view_df):
+    tasks_df = _view_df[_view_df['NextActionDate'].notna()].copy()
+    tasks_df['DaysUntil'] = (tasks_df['NextActionDate'] - pd.to_datetime(today)).dt.days
+    cols = ['Name', 'AssignedTo', 'NextActionDate', 'NextAction']
+    return (tasks_df[tasks_df['DaysUntil'] < 0][cols].sort_values('NextActionDate'), tasks_df[tasks_df['DaysUntil'] == 0][cols],
+            tasks_df[tasks_df['DaysUntil'] > 0][cols].sort_values('NextActionDate'))
+@sized_cache(16)
+def kpi_figures(version, start_datetime, end_datetime, _df, _kpis):
+    status_counts = _kpis['status_counts'].reset_index(); status_counts.columns = ['Status', 'Count']
+    source_counts = _kpis['source_counts'].reset_index(); source_counts.columns = ['ContactSource', 'Count']
+    leads_over_time = _kpis['daily'].rename_axis('CreatedAt').reset_index(name='Count')
+    v = get_live_tickets().with_notes(_df[(_df['CreatedAt'] >= start_datetime) & (_df['CreatedAt'] < end_datetime)])
+    dwell = analytics.dwell_time_stats(calculate_status_durations(v))
+    return {
+        "status": px.bar(status_counts, x='Count', y='Status', orientation='h', title='Leads by Current Status', color_discrete_sequence=px.colors.qualitative.Pastel),
+        "source": px.pie(source_counts, names='ContactSource', values='Count', title='Leads by Contact Source', color_discrete_sequence=px.colors.qualitative.Pastel),
+        "dwell": None if dwell.empty else px.bar(dwell, x='Status', y=['Median (Days)', 'P90 (Days)'], barmode='group', title='Days Spent per Status (Median / P90)', color_discrete_sequence=px.colors.qualitative.Pastel),
+        "time": px.line(leads_over_time, x='CreatedAt', y='Count', title='Daily Lead Creation'),
+    }
+@st.cache_resource
+def get_export_cache():
+    return exports.ExportCache()
+def view_export(version, view_key, view_df, kind):
+    # Deferred download: the file is written only when the button is clicked, then reused for this version and view
+    cache = get_export_cache(); live = get_live_tickets()
+    def write(path):
+        if kind == "csv": exports.write_csv(path, view_df, live.with_notes)
+        else: exports.write_excel(path, exports.ticket_sheets(view_df, live.with_notes, datetime.now()), live.with_notes)
+    def data():
+        with open(cache.get((version, view_key, kind), write), "rb") as f: return f.read()
+    return data
+@sized_cache(8)
+def pipeline_groups(version, view_key, _view_df):
+    # Pipeline columns, newest first; rebuilt only when the data version or view changes
+    return tickets.pipeline_columns(_view_df)
+@sized_cache(8)
+def edit_options(version, view_key, _view_df):
+    # Edit selector labels of the searched/filtered view, in name order
+    return {label: sid for label, sid in get_live_tickets().edit_labels().items() if sid in _view_df.index}
+def toggle_pipeline_card(sid):
+    st.session_state['pipe_open'] = None if st.session_state.get('pipe_open') == sid else sid
+def show_more_pipeline(status):
+    st.session_state[f"pipe_limit_{status}"] = st.session_state.get(f"pipe_limit_{status}", PIPELINE_PAGE) + PIPELINE_PAGE
+def render_pipeline_card(sid, status):
+    # Edit widgets for the one open card
+    row = get_live_tickets().row(sid)
+    if row is None: return
+    can_edit = (st.session_state['role'] == 'admin') or (row['AssignedTo'] == st.session_state['name'])
+    with st.container(border=True):
+        st.caption(f"Updated: {row['LastUpdated'].strftime('%Y-%m-%d %H:%M')}")
+        st.write(row.get("Notes",""))
+        widget_key = f"mv_{sid}"
+        st.selectbox("Move to", STATUS_LIST, index=STATUS_LIST.index(status), key=widget_key, on_change=update_ticket_status, args=(sid, widget_key), disabled=not can_edit)
 def update_ticket_status(submission_id, widget_key):
     new_status = st.session_state[widget_key]
-    row = st.session_state.df[st.session_state.df["SubmissionID"] == submission_id].iloc[0]
+    row = get_live_tickets().row(submission_id)
     if row['Status'] != new_status:
-        payload = {f'submission[{config.FIELD_ID["status"]}]': new_status}
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M")
-        history_note = f"[{timestamp}] Status → {new_status}"
-        new_notes = f"{history_note}\n{row.get('Notes', '')}".strip()
-        payload[f'submission[{config.FIELD_ID["notes"]}]'] = new_notes
-        if new_status in STATUS_TO_DATE_FIELD:
-            date_field_key = STATUS_TO_DATE_FIELD[new_status]; date_field_id = config.FIELD_ID[date_field_key]; now_local = datetime.now()
-            payload.update({f'submission[{date_field_id}][month]': now_local.month, f'submission[{date_field_id}][day]': now_local.day, f'submission[{date_field_id}][year]': now_local.year})
-        if update_jotform_submission(submission_id, payload):
-            st.success(f"Moved ticket {submission_id} to {new_status}"); refresh_data()
+        payload, changes = status_change_fields(new_status, row.get('Notes', ''))
+        if save_ticket_changes(submission_id, payload, changes):
+            st.success(f"Moved ticket {submission_id} to {new_status}")
 def update_ticket_details(sid, new_status, new_service, new_lost, new_notes, new_assigned_to, next_action_date, next_action):
-    row = st.session_state.df[st.session_state.df["SubmissionID"] == sid].iloc[0]
+    row = get_live_tickets().row(sid)
     payload = {
         f'submission[{config.FIELD_ID["service_type"]}]': new_service,
         f'submission[{config.FIELD_ID["lost_reason"]}]': new_lost,
         f'submission[{config.FIELD_ID["assigned_to"]}]': new_assigned_to,
         f'submission[{config.FIELD_ID["next_action"]}]': next_action,
     }
+    changes = {"TypeOfService": new_service, "LostReason": new_lost, "AssignedTo": new_assigned_to, "NextAction": next_action}
     if next_action_date:
         payload[f'submission[{config.FIELD_ID["next_action_date"]}][month]'] = next_action_date.month
         payload[f'submission[{config.FIELD_ID["next_action_date"]}][day]'] = next_action_date.day
         payload[f'submission[{config.FIELD_ID["next_action_date"]}][year]'] = next_action_date.year
+        changes["NextActionDate"] = pd.Timestamp(next_action_date)
     if row['Status'] != new_status:
-        payload[f'submission[{config.FIELD_ID["status"]}]'] = new_status
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M")
-        history_note = f"[{timestamp}] Status → {new_status}"
-        payload[f'submission[{config.FIELD_ID["notes"]}]'] = f"{history_note}\n{new_notes}".strip()
-        if new_status in STATUS_TO_DATE_FIELD:
-            date_field_key = STATUS_TO_DATE_FIELD[new_status]; date_field_id = config.FIELD_ID[date_field_key]; now_local = datetime.now()
-            payload.update({f'submission[{date_field_id}][month]': now_local.month, f'submission[{date_field_id}][day]': now_local.day, f'submission[{date_field_id}][year]': now_local.year})
+        status_payload, status_changes = status_change_fields(new_status, new_notes)
+        payload.update(status_payload); changes.update(status_changes)
     else:
-        payload[f'submission[{config.FIELD_ID["notes"]}]'] = new_notes
-    if update_jotform_submission(sid, payload):
-        st.success(f"Ticket {sid} changes saved."); refresh_data()
+        payload[f'submission[{config.FIELD_ID["notes"]}]'] = new_notes; changes["Notes"] = new_notes
+    if save_ticket_changes(sid, payload, changes):
+        st.success(f"Ticket {sid} changes saved."); st.rerun()
 
 # --- AUTHENTICATION LOGIC ---
 def check_password():
@@ -171,7 +364,18 @@ def check_password():
 def main_app():
     if not st.session_state.get("authentication_status"):
         check_password(); return
+    spans = []  # rerun and section spans, closed however the run ends
+    try:
+        render_app(spans)
+    except (RerunException, StopException):
+        raise  # st.rerun()/st.stop(): a normal end of this run
+    except Exception as e:
+        for span in spans: span.set(error=type(e).__name__)
+        raise
+    finally:
+        for span in reversed(spans): span.end()
 
+def render_app(spans):
     left, mid, right = st.columns([1, 4, 1]);
     with left: st.image(LOGO, use_container_width=True)
     with mid: st.title("Sales Lead Tracker"); st.caption(f"Welcome, {st.session_state['name']} (Role: {st.session_state['role']})")
@@ -180,69 +384,126 @@ def main_app():
         if st.button("Logout", use_container_width=True):
             st.session_state.clear(); st.rerun()
 
-    st.session_state.df = get_jotform_submissions()
+    tracer = get_tracer()
+    tracing.set_context(session=st.session_state.setdefault('session_id', uuid.uuid4().hex)[:8], user=st.session_state['name'])
+    spans.append(tracer.begin("rerun"))
+    st.session_state.df = get_tickets(); version = get_live_tickets().version
+    session_bytes = record_session_memory()
+    box = get_outbox()
+    for entry, error in box.take_failures(st.session_state['name']):
+        if error == outbox.UNCONFIRMED: st.warning(f"New ticket for {(entry.get('changes') or {}).get('Name', entry['sid'])} was {error}. Check the ticket list before adding it again.")
+        else: st.error(f"JotForm rejected a change to ticket {entry['sid']} and it was undone: {error}")
+    if len(box): st.caption(f"⏳ {len(box)} change(s) waiting to sync with JotForm")
+    if st.session_state['role'] == 'admin':
+        with st.expander("🧠 Memory"):
+            usage = get_live_tickets().memory_usage(); sessions = list(get_session_registry().values())
+            views = {name: sum(list(sizes.values())) for name, sizes in list(get_view_sizes().items())}
+            export_files, export_bytes = get_export_cache().disk_usage()
+            mb = lambda n: f"{n / 1024 / 1024:.2f} MB"
+            st.caption(f"Shared dataset: {mb(sum(usage.values()))} (tickets {mb(usage['frame'])} · notes {mb(usage['notes'])} · KPI buckets {mb(usage['kpis'])} · search index {mb(usage['search'])})")
+            st.caption(f"Cached views: {mb(sum(views.values()))}" + (f" ({' · '.join(f'{name} {mb(n)}' for name, n in sorted(views.items()))})" if views else ""))
+            st.caption(f"This session: {mb(session_bytes)} · Active sessions (last hour): {len(sessions)}, holding {mb(sum(b for _, b in sessions))} in total")
+            st.caption(f"Export files: {export_files} on disk, {mb(export_bytes)}")
+        with st.expander("🩺 Diagnostics"):
+            tracer.enabled = st.toggle("Tracing", value=tracer.enabled, help="Off: spans are not timed, logged or kept")
+            summary = tracer.summary()
+            if summary.empty: st.caption("No spans recorded yet.")
+            else: st.dataframe(summary, use_container_width=True, hide_index=True)
+            if tracer.counters: st.caption(" · ".join(f"{name}: {value:,}" for name, value in sorted(tracer.counters.items())))
+            st.caption(f"Last {len(tracer.recent)} spans from all sessions; every span is logged to {config.TRACE_LOG}")
     is_empty = st.session_state.df.empty
     view_mode = st.radio("View Tickets", ["My Tickets", "All Tickets"], index=1, horizontal=True)
-    view_df = st.session_state.df
-    if view_mode == "My Tickets":
-        view_df = st.session_state.df[st.session_state.df['AssignedTo'] == st.session_state['name']]
+    view_key = (view_mode, st.session_state['name'])
+    view_df = ticket_view(version, view_mode, st.session_state['name'], st.session_state.df)
+    query = st.text_input("🔍 Search tickets", placeholder="Name, notes, next action or lost reason", key="search_q").strip()
+    with st.expander("Filters"):
+        f1, f2, f3, f4, f5 = st.columns(5)
+        categories = lambda col: list(st.session_state.df[col].cat.categories) if col in st.session_state.df.columns else []
+        facets = (("Status", tuple(f1.multiselect("Status", STATUS_LIST, key="f_status"))),
+                  ("TypeOfService", tuple(f2.multiselect("Type of Service", SERVICE_TYPES, key="f_service"))),
+                  ("ContactSource", tuple(f3.multiselect("Contact Source", categories("ContactSource"), key="f_source"))),
+                  ("AssignedTo", tuple(f4.multiselect("Assigned To", categories("AssignedTo"), key="f_assigned"))))
+        created = tuple(f5.date_input("Created between", value=(), key="f_created"))
+    is_filtered = bool(query or created or any(values for _, values in facets))
+    if is_filtered:
+        search_key = (query, facets, created)
+        with tracing.span("search", query=bool(query)):
+            view_df = search_view(version, view_key, search_key, view_df); view_key = (*view_key, search_key)
+        st.caption(f"{len(view_df)} matching ticket(s)")
     
-    tab_tasks, tab_pipe, tab_all, tab_add, tab_edit, tab_kpi = st.tabs(["✅ Tasks", "🧩 Pipeline View","📋 All Tickets","➕ Add Ticket","✏️ Edit Ticket","📈 KPI"])
+    # Only the selected section runs on a rerun (st.tabs would execute all six bodies)
+    section = st.radio("Section", SECTIONS, horizontal=True, key="section", label_visibility="collapsed")
     
     if is_empty and view_mode == "All Tickets":
-        st.warning("No tickets found. You can create the first one in the 'Add Ticket' tab.")
+        st.warning("No tickets found. You can create the first one in the 'Add Ticket' section.")
+
+    spans.append(tracer.begin(f"section {section}"))
 
-    with tab_tasks:
+    if section == SECTIONS[0]:
         st.subheader(f"Tasks for {view_mode}")
-        tasks_df = view_df[view_df['NextActionDate'].notna()].copy()
-        if tasks_df.empty:
+        overdue, due_today, upcoming = task_groups(version, view_key, date.today(), view_df)
+        if overdue.empty and due_today.empty and upcoming.empty:
             st.info("No tickets with a 'Next Action Date' found in this view.")
         else:
-            today = pd.to_datetime(date.today())
-            tasks_df['DaysUntil'] = (tasks_df['NextActionDate'] - today).dt.days
-            overdue = tasks_df[tasks_df['DaysUntil'] < 0]
-            due_today = tasks_df[tasks_df['DaysUntil'] == 0]
-            upcoming = tasks_df[tasks_df['DaysUntil'] > 0]
             st.error(f"Overdue Tasks ({len(overdue)})", icon="🔥")
-            if not overdue.empty: st.dataframe(overdue[['Name', 'AssignedTo', 'NextActionDate', 'NextAction']].sort_values('NextActionDate'), use_container_width=True)
+            if not overdue.empty: st.dataframe(overdue, use_container_width=True, hide_index=True)
             st.warning(f"Tasks Due Today ({len(due_today)})", icon="❗")
-            if not due_today.empty: st.dataframe(due_today[['Name', 'AssignedTo', 'NextActionDate', 'NextAction']], use_container_width=True)
+            if not due_today.empty: st.dataframe(due_today, use_container_width=True, hide_index=True)
             st.success(f"Upcoming Tasks ({len(upcoming)})", icon="🗓️")
-            if not upcoming.empty: st.dataframe(upcoming[['Name', 'AssignedTo', 'NextActionDate', 'NextAction']].sort_values('NextActionDate'), use_container_width=True)
+            if not upcoming.empty: st.dataframe(upcoming, use_container_width=True, hide_index=True)
 
-    with tab_pipe:
+    elif section == SECTIONS[1]:
         st.subheader("Pipeline")
         if view_df.empty:
             st.info(f"There are no tickets to display in this view.")
         else:
-            kpi_bar(view_df)
+            view_kpis = get_live_tickets().kpis.query(**({"AssignedTo": st.session_state['name']} if view_mode == "My Tickets" else {}))
+            kpi_bar(view_kpis)
+            groups = pipeline_groups(version, view_key, view_df)
             cols = st.columns(len(STATUS_LIST))
             for i, status in enumerate(STATUS_LIST):
                 with cols[i]:
-                    status_count = int((view_df['Status']==status).sum())
+                    subset = groups.get(status)
+                    status_count = (0 if subset is None else len(subset)) if is_filtered else int(view_kpis['status_counts'].get(status, 0))
                     st.markdown(f"<div style='background:{COLORS[status]};padding:8px;border-radius:8px;color:#111;font-weight:700'>{status} ({status_count})</div>", unsafe_allow_html=True)
-                    subset = view_df[view_df["Status"]==status]
-                    if not subset.empty:
-                        for _, row in subset.sort_values("LastUpdated", ascending=False).iterrows():
-                            can_edit = (st.session_state['role'] == 'admin') or (row['AssignedTo'] == st.session_state['name'])
+                    if subset is not None and not subset.empty:
+                        limit = st.session_state.get(f"pipe_limit_{status}", PIPELINE_PAGE)
+                        for row in subset.head(limit).itertuples(index=False):
+                            can_edit = (st.session_state['role'] == 'admin') or (row.AssignedTo == st.session_state['name'])
                             lock_icon = "" if can_edit else "🔒"
-                            expander_title = f"{row['Name']} · {row.get('AssignedTo', 'Unassigned')} {lock_icon}"
-                            with st.expander(expander_title, expanded=False):
-                                st.caption(f"Updated: {row['LastUpdated'].strftime('%Y-%m-%d %H:%M')}")
-                                st.write(row.get("Notes",""))
-                                widget_key = f"mv_{row['SubmissionID']}"
-                                st.selectbox("Move to", STATUS_LIST, index=STATUS_LIST.index(status), key=widget_key, on_change=update_ticket_status, args=(row['SubmissionID'], widget_key), disabled=not can_edit)
+                            pending_icon = "⏳" if get_live_tickets().is_pending(row.SubmissionID) else ""
+                            card_title = f"{row.Name} · {row.AssignedTo or 'Unassigned'} {lock_icon}{pending_icon}"
+                            st.button(card_title, key=f"card_{row.SubmissionID}", on_click=toggle_pipeline_card, args=(row.SubmissionID,), use_container_width=True)
+                            if st.session_state.get('pipe_open') == row.SubmissionID: render_pipeline_card(row.SubmissionID, status)
+                        if len(subset) > limit:
+                            st.button(f"Load more ({len(subset) - limit} left)", key=f"pipe_more_{status}", on_click=show_more_pipeline, args=(status,), use_container_width=True)
 
-    with tab_all:
+    elif section == SECTIONS[2]:
         st.subheader("All Tickets")
         if view_df.empty:
             st.info("There are no tickets to display.")
         else:
-            st.dataframe(view_df[["SubmissionID","Name","AssignedTo","ContactSource","Status","TypeOfService","NextActionDate", "LostReason","CreatedAt"]], use_container_width=True)
-            csv = view_df.to_csv(index=False).encode('utf-8')
-            st.download_button(label="📥 Download as CSV", data=csv, file_name=f"sales_leads_{datetime.now().strftime('%Y-%m-%d')}.csv", mime="text/csv")
+            if st.session_state.get('bulk_results') is not None:
+                st.dataframe(st.session_state['bulk_results'], use_container_width=True, hide_index=True)
+                if st.button("Dismiss results"): st.session_state['bulk_results'] = None; st.rerun()
+            table = view_df[["SubmissionID","Name","AssignedTo","ContactSource","Status","TypeOfService","NextActionDate", "LostReason","CreatedAt"]]
+            event = st.dataframe(table, use_container_width=True, hide_index=True, on_select="rerun", selection_mode="multi-row", key="all_table")
+            selected = table["SubmissionID"].iloc[event.selection.rows].tolist() if event and event.selection.rows else []
+            if selected:
+                st.markdown(f"##### Bulk action on {len(selected)} selected ticket(s)")
+                c1, c2, c3 = st.columns([1, 2, 1])
+                action = c1.selectbox("Action", ["Move to", "Reassign to", "Delete"], key="bulk_action")
+                target = None
+                if action == "Move to": target = c2.selectbox("Status", STATUS_LIST, key="bulk_status")
+                elif action == "Reassign to": target = c2.selectbox("Sales rep", SALES_TEAM, key="bulk_assignee")
+                else: c2.warning("Selected tickets will be permanently deleted.")
+                if c3.button("Apply", type="primary", use_container_width=True, key="bulk_apply"):
+                    st.session_state['bulk_results'] = bulk_update_tickets(selected, action, target); st.rerun()
+            stamp = datetime.now().strftime('%Y-%m-%d_%H%M'); d1, d2 = st.columns(2)
+            d1.download_button(label="📥 Download as CSV", data=view_export(version, view_key, view_df, "csv"), file_name=f"sales_leads_{stamp}.csv", mime="text/csv")
+            d2.download_button(label="📊 Download Excel", data=view_export(version, view_key, view_df, "xlsx"), file_name=f"sales_leads_{stamp}.xlsx", mime=exports.XLSX_MIME)
 
-    with tab_add:
+    elif section == SECTIONS[3]:
         st.subheader("Add Ticket")
         with st.form("add"):
             c1, c2 = st.columns(2);
@@ -277,21 +538,25 @@ def main_app():
                                 f'submission[{config.FIELD_ID["next_action_date"]}][day]': next_action_date.day,
                                 f'submission[{config.FIELD_ID["next_action_date"]}][year]': next_action_date.year,
                             })
+                        row = {"Name": f"{first} {last}".strip(), "AssignedTo": assigned_to, "ContactSource": source, "Status": status, "TypeOfService": service,
+                               "LostReason": lost, "Notes": notes, "NextAction": next_action, "NextActionDate": pd.Timestamp(next_action_date) if next_action_date else pd.NaT}
                         if status in STATUS_TO_DATE_FIELD:
                             date_field_key = STATUS_TO_DATE_FIELD[status]; date_field_id = config.FIELD_ID[date_field_key]; now_local = datetime.now()
                             payload.update({f'submission[{date_field_id}][month]': now_local.month, f'submission[{date_field_id}][day]': now_local.day, f'submission[{date_field_id}][year]': now_local.year})
-                        if add_jotform_submission(payload):
-                            st.success("Ticket created successfully."); refresh_data()
+                            if date_field_key in DATE_FIELD_COLUMNS: row[DATE_FIELD_COLUMNS[date_field_key]] = pd.Timestamp(now_local.date())
+                        if create_ticket(payload, row):
+                            st.success("Ticket created successfully."); st.rerun()
     
-    with tab_edit:
+    elif section == SECTIONS[4]:
         st.subheader("Edit Ticket")
         if is_empty: st.info("There are no tickets to edit.")
         else:
-            opts = {f"{r['Name']} · {r.get('AssignedTo', 'Unassigned')} ({r['SubmissionID']})": r["SubmissionID"] for _, r in st.session_state.df.sort_values("Name").iterrows()}
+            opts = get_live_tickets().edit_labels()
+            if is_filtered: opts = edit_options(version, view_key, view_df)
             sel_key = st.selectbox("Select a Ticket to Edit", list(opts.keys()), key="edit_sel")
             if sel_key:
                 sid = opts[sel_key]
-                row = st.session_state.df[st.session_state.df["SubmissionID"]==sid].iloc[0]
+                row = get_live_tickets().row(sid)
                 can_edit = (st.session_state['role'] == 'admin') or (row['AssignedTo'] == st.session_state['name'])
                 if not can_edit: st.warning("🔒 You do not have permission to edit this ticket.", icon="⚠️")
                 c1,c2 = st.columns(2)
@@ -320,13 +585,13 @@ def main_app():
                     c_yes, c_no = st.columns(2)
                     with c_yes:
                         if st.button("Yes, Delete Permanently", type="primary", use_container_width=True):
-                            if delete_jotform_submission(sid):
-                                st.success(f"Ticket {sid} has been permanently deleted."); st.session_state['confirm_delete'] = None; refresh_data()
+                            if remove_ticket(sid):
+                                st.success(f"Ticket {sid} has been permanently deleted."); st.session_state['confirm_delete'] = None; st.rerun()
                     with c_no:
                         if st.button("No, Keep It", use_container_width=True):
                             st.session_state['confirm_delete'] = None
 
-    with tab_kpi:
+    elif section == SECTIONS[5]:
         st.subheader("KPI & Lifecycle Dashboard (All Tickets)")
         if is_empty: st.info("There is no data for the KPI dashboard.")
         else:
@@ -334,15 +599,15 @@ def main_app():
             c1, c2 = st.columns(2)
             start_date = c1.date_input("Start Date", value=datetime.now() - timedelta(days=90)); end_date = c2.date_input("End Date", value=datetime.now())
             start_datetime = pd.to_datetime(start_date).tz_localize('UTC'); end_datetime = (pd.to_datetime(end_date) + timedelta(days=1)).tz_localize('UTC')
-            v = st.session_state.df[(st.session_state.df['CreatedAt'] >= start_datetime) & (st.session_state.df['CreatedAt'] < end_datetime)].copy()
+            kpis = get_live_tickets().kpis.query(start_datetime, end_datetime)
             st.markdown("---")
-            if v.empty: st.warning("No tickets found in the selected date range.")
+            if kpis['total'] == 0: st.warning("No tickets found in the selected date range.")
             else:
-                kpi_bar(v); st.markdown("---")
+                kpi_bar(kpis); st.markdown("---")
                 col1, col2 = st.columns(2)
                 with col1:
                     st.subheader("📈 Conversion Rate")
-                    installed_count = (v['Status'] == 'Installed').sum(); lost_count = (v['Status'] == 'Lost').sum()
+                    installed_count = kpis['installed']; lost_count = kpis['lost']
                     total_resolved = installed_count + lost_count
                     if total_resolved > 0:
                         conversion_rate = (installed_count / total_resolved) * 100
@@ -350,31 +615,26 @@ def main_app():
                     else: st.info("No tickets were resolved in this period.")
                 with col2:
                     st.subheader("⏱️ Process Duration")
-                    installed_tickets = v[v['InstalledDate'].notna() & v['SurveyScheduledDate'].notna()].copy()
-                    if not installed_tickets.empty:
-                        installed_tickets['Duration'] = (installed_tickets['InstalledDate'] - installed_tickets['SurveyScheduledDate']).dt.days
-                        avg_duration = installed_tickets['Duration'].mean()
+                    avg_duration = kpis['avg_duration']
+                    if avg_duration is not None:
                         st.metric("Avg. Survey to Install", f"{avg_duration:.1f} Days")
                     else: st.info("No tickets completed the full process in this period.")
                 st.markdown("---")
                 st.subheader("📊 Visual Analytics")
                 c1, c2 = st.columns(2)
-                with c1:
-                    status_counts = v['Status'].value_counts().reset_index()
-                    status_counts.columns = ['Status', 'Count']
-                    fig_status = px.bar(status_counts, x='Count', y='Status', orientation='h', title='Leads by Current Status', color_discrete_sequence=px.colors.qualitative.Pastel)
-                    st.plotly_chart(fig_status, use_container_width=True)
-                with c2:
-                    source_counts = v['ContactSource'].value_counts().reset_index()
-                    source_counts.columns = ['ContactSource', 'Count']
-                    fig_source = px.pie(source_counts, names='ContactSource', values='Count', title='Leads by Contact Source', color_discrete_sequence=px.colors.qualitative.Pastel)
-                    st.plotly_chart(fig_source, use_container_width=True)
+                with tracing.span("kpi figures"):
+                    figures = kpi_figures(version, start_datetime, end_datetime, st.session_state.df, kpis)
+                with c1: st.plotly_chart(figures['status'], use_container_width=True)
+                with c2: st.plotly_chart(figures['source'], use_container_width=True)
+                st.markdown("---")
+                st.subheader("🕒 Time in Status")
+                if figures['dwell'] is None: st.info("No status history in this period.")
+                else: st.plotly_chart(figures['dwell'], use_container_width=True)
                 st.markdown("---")
                 st.subheader("⏳ Leads Created Over Time")
-                leads_over_time = v.set_index('CreatedAt').resample('D').size().reset_index(name='Count')
-                fig_time = px.line(leads_over_time, x='CreatedAt', y='Count', title='Daily Lead Creation')
-                st.plotly_chart(fig_time, use_container_width=True)
+                st.plotly_chart(figures['time'], use_container_width=True)
 
+    spans.pop().end()
     st.markdown("<hr/>", unsafe_allow_html=True)
     st.caption("Powered by Pioneer Broadband | Internal Use Only")
 
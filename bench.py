@@ -0,0 +1,166 @@
+# Benchmarks for the Sales Lead Tracker data path
+# Usage: python bench.py [sizes...] [--latency S] [--baseline FILE] [--save-baseline FILE] [--legacy]   (default sizes: 10000 50000)
+# Serves synthetic submissions from an in-process mock_jotform server and times each step of the app's data path
+
+import argparse
+import json
+import platform
+import re
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import analytics
+import config
+import jotform
+import mock_jotform
+import synthetic
+import tickets
+
+def legacy_parse(data, field_id):
+    # The per-row loop get_jotform_submissions used before normalize_submissions
+    records = []
+    for sub in data:
+        if sub.get('status') == 'ACTIVE':
+            answers = sub.get('answers', {})
+            def get_ans(qid):
+                ans_dict = answers.get(str(qid)); return ans_dict.get('answer', '') if ans_dict else ''
+            def get_date_ans(qid):
+                date_ans = get_ans(qid)
+                if isinstance(date_ans, dict):
+                    date_str = f"{date_ans.get('year')}-{date_ans.get('month')}-{date_ans.get('day')}"
+                    return pd.to_datetime(date_str, errors='coerce')
+                return pd.to_datetime(date_ans, errors='coerce')
+            name_field_str = field_id.get('name_first', ''); name_id_match = re.search(r'\d+', name_field_str)
+            first_name, last_name = '', ''
+            if name_id_match:
+                name_id = name_id_match.group(); name_ans = get_ans(name_id)
+                first_name = name_ans.get('first', '') if isinstance(name_ans, dict) else ''
+                last_name = name_ans.get('last', '') if isinstance(name_ans, dict) else ''
+            records.append({
+                "SubmissionID": sub.get('id'), "Name": f"{first_name} {last_name}".strip(),
+                "AssignedTo": get_ans(field_id['assigned_to']), "ContactSource": get_ans(field_id['source']),
+                "Status": get_ans(field_id['status']), "TypeOfService": get_ans(field_id['service_type']),
+                "LostReason": get_ans(field_id['lost_reason']), "Notes": get_ans(field_id['notes']),
+                "CreatedAt": pd.to_datetime(sub.get('created_at'), utc=True),
+                "LastUpdated": pd.to_datetime(sub.get('updated_at'), utc=True) if sub.get('updated_at') else pd.to_datetime(sub.get('created_at'), utc=True),
+                "SurveyScheduledDate": get_date_ans(field_id['survey_scheduled_date']),
+                "InstalledDate": get_date_ans(field_id['installed_date']),
+                "NextActionDate": get_date_ans(field_id['next_action_date']),
+                "NextAction": get_ans(field_id['next_action']),
+            })
+    return pd.DataFrame(records)
+
+def legacy_status_durations(df, now):
+    # The iterrows implementation calculate_status_durations used before analytics.status_durations
+    duration_records = []
+    for _, row in df.iterrows():
+        notes = row.get('Notes', '') or ''; history = re.findall(r'\[(.*?)\] Status → (.*?)\n', notes)
+        events = [{'timestamp': pd.to_datetime(ts_str, utc=True), 'status': status} for ts_str, status in history]
+        events.sort(key=lambda x: x['timestamp'])
+        first_event_timestamp = row['CreatedAt']
+        initial_status = events[0]['status'] if events else row['Status']
+        events.insert(0, {'timestamp': first_event_timestamp, 'status': initial_status})
+        for i in range(len(events)):
+            start_time = events[i]['timestamp']; end_time = events[i+1]['timestamp'] if i + 1 < len(events) else now
+            duration = (end_time - start_time).total_seconds() / (3600 * 24)
+            duration_records.append({'SubmissionID': row['SubmissionID'], 'Name': row['Name'], 'Status': events[i]['status'], 'Duration (Days)': duration})
+    return pd.DataFrame(duration_records)
+
+def timed(fn, *args):
+    started = time.perf_counter(); result = fn(*args)
+    return result, time.perf_counter() - started
+
+def bench_normalizer(n):
+    subs = synthetic.submissions(n)
+    old, t_old = timed(legacy_parse, subs, config.FIELD_ID)
+    new, t_new = timed(jotform.normalize_submissions, subs, config.FIELD_ID)
+    for col in jotform.COLUMNS:
+        a, b = old[col], new[col]
+        if pd.api.types.is_datetime64_any_dtype(a): a, b = a.astype("datetime64[ns, UTC]" if a.dt.tz else "datetime64[ns]"), b.astype("datetime64[ns, UTC]" if b.dt.tz else "datetime64[ns]")
+        pd.testing.assert_series_equal(a, b, check_dtype=False)
+    print(f"normalize n={n:>7}: legacy {t_old:7.3f}s  vectorized {t_new:7.3f}s  ({t_old / t_new:5.1f}x)")
+
+def bench_status_durations(n):
+    df = jotform.normalize_submissions(synthetic.submissions(n), config.FIELD_ID)
+    now = pd.Timestamp("2026-01-01", tz="UTC")
+    old, t_old = timed(legacy_status_durations, df, now)
+    new, t_new = timed(analytics.status_durations, df, now)
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+    print(f"durations n={n:>7}: legacy {t_old:7.3f}s  vectorized {t_new:7.3f}s  ({t_old / t_new:5.1f}x)")
+
+# --- STEP RUNNER ---
+TOLERANCE = 0.25  # slower than baseline by more than this fraction counts as a regression
+
+def measure(fn, *args, memory=True):
+    """(result, seconds, peak MB). The peak comes from a second, traced run so tracing does not skew the timing."""
+    result, seconds = timed(fn, *args)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try: fn(*args); peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally: tracemalloc.stop()
+    return result, seconds, peak
+
+def run_steps(n, latency=0.0, memory=True):
+    """Time the app's data path for ``n`` synthetic submissions; returns {step: (seconds, peak MB)}."""
+    mock = mock_jotform.MockJotForm(synthetic.submissions(n), latency=latency)
+    server, url = mock_jotform.serve(mock)
+    client = jotform.JotFormClient("bench", base_url=url); now = pd.Timestamp(synthetic.REFERENCE, tz="UTC")
+    try:
+        results = {}
+        def step(name, fn, *args):
+            result, seconds, peak = measure(fn, *args, memory=memory); results[name] = (seconds, peak)
+            return result
+        subs = step("load", lambda: client.fetch_submissions(mock_jotform.FORM_ID)[0])
+        df = step("parse", jotform.normalize_submissions, subs, config.FIELD_ID)
+        step("durations", analytics.status_durations, df, now)
+        kpis = step("kpi build", analytics.KpiAggregates, df)
+        step("kpi query", lambda: kpis.query(start=now - pd.Timedelta(days=90), AssignedTo=synthetic.SALES_REPS[0]))
+        cache = tickets.TicketCache(); frame = cache.get(lambda: df)
+        step("pipeline", tickets.pipeline_columns, frame)
+        return results
+    finally:
+        server.shutdown(); server.server_close()
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Print every step against ``baseline`` (same shape as the saved JSON); returns the regressed keys."""
+    regressed = []
+    print(f"{'step':<12}{'n':>8}{'seconds':>10}{'baseline':>10}{'change':>9}{'peak MB':>10}")
+    for key, row in results.items():
+        name, n = key.rsplit("@", 1); base = (baseline or {}).get(key)
+        change = (row["seconds"] / base["seconds"] - 1) if base and base["seconds"] else None
+        if change is not None and change > tolerance: regressed.append(key)
+        base_s = f"{base['seconds']:.3f}" if base else "-"
+        change_s = f"{change:+.0%}" if change is not None else "-"
+        peak_s = f"{row['peak_mb']:.1f}" if row["peak_mb"] is not None else "-"
+        print(f"{name:<12}{n:>8}{row['seconds']:>10.3f}{base_s:>10}{change_s:>9}{peak_s:>10}{'  REGRESSION' if key in regressed else ''}")
+    return regressed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sales Lead Tracker data-path benchmarks")
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 50_000], help="synthetic submission counts (1k-500k)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of mock API latency per request")
+    parser.add_argument("--baseline", help="JSON file from --save-baseline to compare against")
+    parser.add_argument("--save-baseline", help="write this run's results to a JSON file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown vs the baseline (0.25 = 25%%)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run that measures peak memory")
+    parser.add_argument("--legacy", action="store_true", help="also compare against the pre-vectorization implementations")
+    args = parser.parse_args()
+    results = {}
+    for n in args.sizes:
+        for name, (seconds, peak) in run_steps(n, args.latency, memory=not args.no_memory).items():
+            results[f"{name}@{n}"] = {"seconds": round(seconds, 4), "peak_mb": None if peak is None else round(peak, 1)}
+        if args.legacy:
+            bench_normalizer(n)
+            bench_status_durations(n)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)["results"]
+    regressed = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "pandas": pd.__version__, "results": results}, f, indent=2)
+    sys.exit(1 if regressed else 0)
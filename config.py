@@ -26,3 +26,13 @@ FIELD_ID = {
 STATUS_LIST = ["Survey Scheduled","Survey Completed","Scheduled","Installed","Waiting on Customer","Lost"]
 SERVICE_TYPES = ["Internet","Phone","TV","Cell Phone","Internet and Phone","Internet and TV","Internet and Cell Phone"]
 TEST_PREFIX = "TEST – Pioneer Broadband"
+
+# Local ticket store (SQLite), synced incrementally from JotForm
+STORE_PATH = "saleslead_store.db"
+
+# Write-behind outbox (JSON lines) for edits not yet confirmed by JotForm
+OUTBOX_PATH = "saleslead_outbox.jsonl"
+
+# Performance tracing: spans go to a rotating JSON-lines log and the admin Diagnostics panel
+TRACE_ENABLED = True
+TRACE_LOG = "saleslead_trace.jsonl"
@@ -0,0 +1,121 @@
+# Ticket exports for the Sales Lead Tracker
+# CSV and multi-sheet Excel files written in chunks, generated on request and reused per data version and view
+
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+import analytics
+import config
+
+CHUNK_ROWS = 20_000  # rows converted (Notes joined, dates made Excel-safe) at a time
+KEEP_FILES = 8
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def _chunks(frame, prepare, chunk_rows):
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        yield start, prepare(chunk) if prepare else chunk
+
+def _excel_safe(frame):
+    # Excel has no time zones: write UTC timestamps as naive
+    tz = [c for c in frame.columns if isinstance(frame[c].dtype, pd.DatetimeTZDtype)]
+    return frame.assign(**{c: frame[c].dt.tz_localize(None) for c in tz}) if tz else frame
+
+def write_csv(path, frame, prepare=None, chunk_rows=CHUNK_ROWS):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for start, chunk in _chunks(frame, prepare, chunk_rows): chunk.to_csv(f, index=False, header=start == 0)
+
+def write_excel(path, sheets, prepare=None, chunk_rows=CHUNK_ROWS):
+    """One worksheet per ``sheets`` item.
+
+    A DataFrame value is a ticket list, written in chunks with ``prepare``
+    applied to each; a list value holds small tables written as they are,
+    stacked with a blank row between.
+    """
+    try:
+        import xlsxwriter  # noqa: F401
+        engine = "xlsxwriter"
+    except ImportError:
+        engine = "openpyxl"
+    with open(path, "wb") as f, pd.ExcelWriter(f, engine=engine) as writer:
+        for name, frames in sheets.items():
+            row = 0
+            tables = isinstance(frames, list)
+            for frame in frames if tables else [frames]:
+                for start, chunk in _chunks(frame, None if tables else prepare, chunk_rows):
+                    chunk = _excel_safe(chunk)
+                    chunk.to_excel(writer, sheet_name=name[:31], index=False, header=start == 0, startrow=row)
+                    row += len(chunk) + (start == 0)
+                row += 1
+
+def ticket_sheets(view_df, with_notes, generated_at):
+    """Sheets for the Excel export: one per status (STATUS_LIST order) plus KPIs and time in status."""
+    sheets = {status: view_df[view_df["Status"] == status] for status in config.STATUS_LIST}
+    for status in view_df["Status"].dropna().unique():
+        if status not in sheets: sheets[str(status)] = view_df[view_df["Status"] == status]
+    kpis = analytics.KpiAggregates(view_df).query()
+    summary = pd.DataFrame({"Metric": ["Generated", "Total Leads", "Installed", "Lost", "Avg Survey → Install (Days)"],
+                            "Value": [generated_at.strftime("%Y-%m-%d %H:%M"), kpis["total"], kpis["installed"], kpis["lost"],
+                                      None if kpis["avg_duration"] is None else round(kpis["avg_duration"], 1)]})
+    by_status = kpis["status_counts"].rename_axis("Status").reset_index(name="Tickets")
+    dwell = analytics.dwell_time_stats(analytics.status_durations(with_notes(view_df)))
+    return {**{k: v for k, v in sheets.items() if not v.empty}, "KPIs & Durations": [summary, by_status, dwell]}
+
+class ExportCache:
+    """Generated export files on disk, keyed by (data version, view, format).
+
+    ``get(key, write)`` returns the path of the file for ``key``, calling
+    ``write(path)`` only the first time; the least recently used files beyond
+    ``keep`` are deleted.
+    """
+
+    def __init__(self, directory=None, keep=KEEP_FILES):
+        self.directory = directory or tempfile.mkdtemp(prefix="saleslead_exports_")
+        self.keep = keep
+        self._files = OrderedDict()
+        self._writing = {}  # key -> lock held while that file is written
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            path = self._files.get(key)
+            if path and os.path.exists(path):
+                self._files.move_to_end(key); return path
+            return None
+
+    def get(self, key, write):
+        # Only requests for the same key wait for its write; other keys and cache hits are served meanwhile
+        path = self._cached(key)
+        if path: return path
+        with self._lock: writing = self._writing.setdefault(key, threading.Lock())
+        with writing:
+            path = self._cached(key)
+            if path: return path
+            path = os.path.join(self.directory, uuid.uuid4().hex)
+            try:
+                write(path + ".part"); os.replace(path + ".part", path)
+            except BaseException:
+                if os.path.exists(path + ".part"): os.remove(path + ".part")
+                with self._lock: self._writing.pop(key, None)
+                raise
+            with self._lock:
+                # Register the file before dropping the writer lock, so a new request finds one or the other
+                self._files[key] = path; self._writing.pop(key, None)
+                while len(self._files) > self.keep:
+                    _, old = self._files.popitem(last=False)
+                    if os.path.exists(old): os.remove(old)
+            return path
+
+    def disk_usage(self):
+        """(files, bytes) currently kept."""
+        with self._lock: paths = list(self._files.values())
+        sizes = []
+        for path in paths:
+            try: sizes.append(os.path.getsize(path))
+            except OSError: pass  # evicted meanwhile
+        return len(sizes), sum(sizes)
@@ -0,0 +1,230 @@
+# JotForm API access for the Sales Lead Tracker
+# Pooled, retrying API client with paged and bulk operations, and the payload normalizer
+
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+import tracing
+
+log = logging.getLogger(__name__)
+
+BASE_URL = "https://api.jotform.com"
+PAGE_SIZE = 1000
+MAX_WORKERS = 8
+TIMEOUT = (5, 30)  # (connect, read) seconds, per request
+MAX_RETRIES = 4
+BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+UNSENT_RETRY_STATUS = {429}  # refused before processing: the only status a non-idempotent call retries
+
+def _new_session(pool_size):
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter); s.mount("http://", adapter)
+    return s
+
+def _retry_delay(resp, attempt, backoff):
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try: return max(float(retry_after), 0.0)
+        except ValueError: pass
+    return backoff * (2 ** attempt)
+
+def unsent(error):
+    """Whether a request failed before reaching the server (refused or timed-out connect), so it cannot have been processed."""
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+class JotFormClient:
+    """JotForm API client over one pooled keep-alive session; safe to share between threads.
+
+    Every call has a timeout and is retried with exponential backoff on
+    connection errors, timeouts, 429 and 5xx. Non-idempotent calls (POST by
+    default, e.g. adding a submission) are only retried when the request
+    cannot have been processed: failed connects and 429. A 429 (or its
+    Retry-After) pauses all threads using the client, not just the one that
+    hit it.
+    """
+
+    def __init__(self, api_key, base_url=BASE_URL, max_workers=MAX_WORKERS, timeout=TIMEOUT, retries=MAX_RETRIES, backoff=BACKOFF):
+        self.api_key = api_key; self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers; self.timeout = timeout; self.retries = retries; self.backoff = backoff
+        self.session = _new_session(max_workers)
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_for_cooldown(self):
+        delay = self._cooldown_until - time.monotonic()
+        if delay > 0: time.sleep(delay)
+
+    def _cool_down(self, delay):
+        with self._lock: self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+    def request(self, method, path, params=None, data=None, idempotent=None):
+        url = f"{self.base_url}/{path}"; params = {**(params or {}), "apiKey": self.api_key}
+        if idempotent is None: idempotent = method != "POST"
+        retry_status = RETRY_STATUS if idempotent else UNSENT_RETRY_STATUS
+        with tracing.span(f"api {method}", path=path) as span:
+            for attempt in range(self.retries + 1):
+                self._wait_for_cooldown()
+                try:
+                    resp = self.session.request(method, url, params=params, data=data, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt == self.retries or not (idempotent or unsent(e)): raise
+                    time.sleep(_retry_delay(None, attempt, self.backoff)); continue
+                if resp.status_code in retry_status and attempt < self.retries:
+                    delay = _retry_delay(resp, attempt, self.backoff)
+                    if resp.status_code == 429: self._cool_down(delay)
+                    else: time.sleep(delay)
+                    continue
+                span.set(status=resp.status_code, attempts=attempt + 1, bytes=len(resp.content)); tracing.count("bytes transferred", len(resp.content))
+                resp.raise_for_status()
+                return resp
+
+    def _json(self, resp):
+        return resp.json() if resp.content else {"responseCode": resp.status_code}
+
+    def _fetch_page(self, path, offset, limit, params):
+        started = time.perf_counter()
+        resp = self.request("GET", path, params={**(params or {}), "offset": offset, "limit": limit})
+        body = resp.json()
+        content = body.get("content") or []
+        stats = {"offset": offset, "rows": len(content), "seconds": time.perf_counter() - started, "bytes": len(resp.content)}
+        log.info("JotForm page offset=%s rows=%s in %.3fs", offset, stats["rows"], stats["seconds"])
+        return content, body.get("resultSet") or {}, stats
+
+    def _submission_count(self, form_id):
+        try: return int((self.request("GET", f"form/{form_id}").json().get("content") or {}).get("count") or 0)
+        except (TypeError, ValueError): return 0
+
+    def fetch_submissions(self, form_id, params=None, page_size=PAGE_SIZE, passes=3):
+        """Return (submissions, page_stats) for every submission of the form.
+
+        The first page tells us whether more exist; the remaining offsets are then
+        fetched concurrently. Any page that still fails after retries raises, so
+        the caller never sees a silently truncated result. Extra ``params`` (e.g. a
+        JotForm ``filter``) are sent with every page.
+
+        Pages are newest first, so a submission created mid-fetch shifts the
+        later offsets and a row can fall between two pages. After paging, the
+        head of the listing is read again; if it moved, the form is paged again
+        and the passes merged, up to ``passes`` times before giving up.
+        """
+        path = f"form/{form_id}/submissions"
+        head = lambda: self._fetch_page(path, 0, 1, params)[0][:1]
+        submissions, seen, stats = [], set(), []
+        for _ in range(passes):
+            pages, pass_stats = self._fetch_pages(form_id, path, params, page_size)
+            stats += pass_stats
+            for content in pages:
+                for sub in content:
+                    sid = sub.get("id")
+                    if sid in seen: continue
+                    seen.add(sid); submissions.append(sub)
+            if len(pages) == 1: return submissions, stats  # one page is one consistent read
+            first = pages[0][:1]
+            if [s.get("id") for s in head()] == [s.get("id") for s in first]: return submissions, stats
+            log.info("JotForm listing changed while paging %s, paging again", path)
+        raise RuntimeError(f"JotForm submissions for form {form_id} kept changing while paging; try again")
+
+    def _fetch_pages(self, form_id, path, params, page_size):
+        fetch = lambda off: self._fetch_page(path, off, page_size, params)
+        first, result_set, first_stats = fetch(0)
+        pages = [(0, first)]; stats = [first_stats]
+        if len(first) >= page_size:
+            # The form-wide count is only meaningful for an unfiltered fetch.
+            total = int(result_set.get("total") or 0) or (0 if params else self._submission_count(form_id))
+            offsets = list(range(page_size, max(total, page_size), page_size))
+            if offsets:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(offsets))) as pool:
+                    for off, (content, _, page_stats) in zip(offsets, pool.map(fetch, offsets)):
+                        pages.append((off, content)); stats.append(page_stats)
+            # The count can lag behind new submissions; keep paging until a short page.
+            offset = pages[-1][0]
+            while len(pages[-1][1]) >= page_size:
+                offset += page_size
+                content, _, page_stats = fetch(offset)
+                pages.append((offset, content)); stats.append(page_stats)
+        return [content for _, content in pages], stats
+
+    def update_submission(self, submission_id, payload):
+        # Sets field values, so repeating it is harmless
+        return self._json(self.request("POST", f"submission/{submission_id}", data=payload, idempotent=True))
+
+    def add_submission(self, form_id, payload):
+        return self._json(self.request("POST", f"form/{form_id}/submissions", data=payload))
+
+    def delete_submission(self, submission_id):
+        return self._json(self.request("DELETE", f"submission/{submission_id}"))
+
+    def run_bulk(self, fn, items):
+        """Call ``fn(item)`` for every item on a bounded pool; returns [(item, result, error)] in input order."""
+        def run(item):
+            try: return item, fn(item), None
+            except Exception as e: return item, None, e
+        if not items: return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(run, items))
+
+# --- SUBMISSION NORMALIZER ---
+TEXT_FIELDS = {
+    "AssignedTo": "assigned_to", "ContactSource": "source", "Status": "status",
+    "TypeOfService": "service_type", "LostReason": "lost_reason", "Notes": "notes",
+}
+DATE_FIELDS = {"SurveyScheduledDate": "survey_scheduled_date", "InstalledDate": "installed_date", "NextActionDate": "next_action_date"}
+COLUMNS = [
+    "SubmissionID", "Name", "AssignedTo", "ContactSource", "Status", "TypeOfService", "LostReason", "Notes",
+    "CreatedAt", "LastUpdated", "SurveyScheduledDate", "InstalledDate", "NextActionDate", "NextAction",
+]
+
+def _to_dates(values):
+    # One vectorized parse for the common Y-M-D form; only leftovers take the slow per-value path
+    s = pd.Series(values, dtype=object)
+    out = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    retry = out.isna() & s.notna() & (s.astype(str).str.strip() != "")
+    if retry.any():
+        out = out.astype("datetime64[us]")
+        out[retry] = pd.to_datetime(s[retry], format="mixed", errors="coerce")
+    return out
+
+def normalize_submissions(data, field_id):
+    """Turn raw JotForm submissions into the ticket frame.
+
+    Answers are flattened into per-column lists in a single pass; timestamps and
+    ``{year, month, day}`` date answers are then parsed once per column.
+    """
+    name_match = re.search(r"\d+", str(field_id.get("name_first", "")))
+    name_qid = name_match.group() if name_match else None
+    text_qids = {col: str(field_id[key]) for col, key in TEXT_FIELDS.items()}
+    date_qids = {col: str(field_id[key]) for col, key in DATE_FIELDS.items()}
+    next_action_qid = str(field_id["next_action"])
+    cols = {c: [] for c in COLUMNS}
+    created, updated = cols["CreatedAt"], cols["LastUpdated"]
+    for sub in data:
+        if sub.get("status") != "ACTIVE": continue
+        answers = sub.get("answers")
+        if not isinstance(answers, dict): answers = {}
+        get = lambda qid: (answers.get(qid) or {}).get("answer", "")
+        cols["SubmissionID"].append(sub.get("id"))
+        name = get(name_qid) if name_qid else ""
+        cols["Name"].append(f"{name.get('first', '')} {name.get('last', '')}".strip() if isinstance(name, dict) else "")
+        for col, qid in text_qids.items(): cols[col].append(get(qid))
+        for col, qid in date_qids.items():
+            v = get(qid)
+            cols[col].append(f"{v.get('year')}-{v.get('month')}-{v.get('day')}" if isinstance(v, dict) else v)
+        cols["NextAction"].append(get(next_action_qid))
+        created.append(sub.get("created_at")); updated.append(sub.get("updated_at") or sub.get("created_at"))
+    cols["CreatedAt"] = pd.to_datetime(pd.Series(created, dtype=object), utc=True)
+    cols["LastUpdated"] = pd.to_datetime(pd.Series(updated, dtype=object), utc=True)
+    for col in DATE_FIELDS: cols[col] = _to_dates(cols[col])
+    if not created:
+        for col in ["SubmissionID", "Name", *TEXT_FIELDS, "NextAction"]: cols[col] = pd.Series(dtype=object)
+    return pd.DataFrame(cols, columns=COLUMNS)
@@ -0,0 +1,156 @@
+# Local stand-in for the JotForm API endpoints the Sales Lead Tracker uses
+# Usage: python mock_jotform.py [--count N] [--port P] [--latency S] [--error-rate R] [--rate-limit RPS]
+# then set JOTFORM_BASE_URL = "http://127.0.0.1:P" and JOTFORM_FORM_ID = "mock" in .streamlit/secrets.toml
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import synthetic
+
+FORM_ID = "mock"
+FIELD_KEY = re.compile(r"^submission\[(\w+)\](?:\[(\w+)\])?$")
+
+class MockJotForm:
+    """In-memory JotForm form serving the submissions endpoints.
+
+    GET form/{id}/submissions (offset/limit paging and the created_at /
+    updated_at ``:gt`` filters), GET form/{id} (count), POST form/{id}/submissions
+    (add), POST submission/{sid} (update) and DELETE submission/{sid} (marks the
+    submission DELETED, as JotForm does). Each request waits ``latency``
+    seconds, fails with a 503 at ``error_rate`` and gets a 429 with Retry-After
+    above ``rate_limit`` requests per second (0 = unlimited).
+    """
+
+    def __init__(self, submissions=(), form_id=FORM_ID, latency=0.0, error_rate=0.0, rate_limit=0, api_key=None, seed=0):
+        self.form_id = form_id; self.latency = latency; self.error_rate = error_rate; self.rate_limit = rate_limit; self.api_key = api_key
+        self.subs = {s["id"]: s for s in submissions}
+        self.counts = {"requests": 0, "errors": 0, "throttled": 0}
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._listing = {}  # filter -> newest-first list, cleared on every write
+        self._window = []  # request times within the last second
+
+    def _admit(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            if self.error_rate and self._rnd.random() < self.error_rate:
+                self.counts["errors"] += 1; return 503, {"responseCode": 503, "message": "Injected error"}, {}
+            if self.rate_limit:
+                now = time.monotonic(); self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= self.rate_limit:
+                    self.counts["throttled"] += 1; return 429, {"responseCode": 429, "message": "Too many requests"}, {"Retry-After": "1"}
+                self._window.append(now)
+        return None
+
+    def _listing_for(self, filter_json):
+        with self._lock:
+            if filter_json not in self._listing:
+                if len(self._listing) > 16: self._listing.clear()  # every delta sync sends a new high-water mark
+                subs = sorted(self.subs.values(), key=lambda s: (s["created_at"], s["id"]), reverse=True)
+                for key, value in (json.loads(filter_json) if filter_json else {}).items():
+                    field, _, op = key.partition(":")
+                    if op == "gt": subs = [s for s in subs if (s.get(field) or "") > value]
+                self._listing[filter_json] = subs
+            return self._listing[filter_json]
+
+    def _write(self, fn):
+        with self._lock:
+            self._listing.clear(); return fn()
+
+    def _answers(self, form):
+        answers = {}
+        for key, values in form.items():
+            m = FIELD_KEY.match(key)
+            if not m: continue
+            qid, part = m.groups()
+            if part: answers.setdefault(qid, {"answer": {}})["answer"][part] = values[-1]
+            else: answers[qid] = {"answer": values[-1]}
+        return answers
+
+    def handle(self, method, path, query, form):
+        """(status, JSON body, headers) for one request."""
+        if self.latency: time.sleep(self.latency)
+        refused = self._admit()
+        if refused: return refused
+        if self.api_key and query.get("apiKey", [None])[0] != self.api_key:
+            return 401, {"responseCode": 401, "message": "You're not authorized to use (apiKey)"}, {}
+        now = datetime.now().strftime(synthetic.JOTFORM_TS)
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["form", self.form_id, "submissions"]:
+            offset = int(query.get("offset", ["0"])[0]); limit = int(query.get("limit", ["20"])[0])
+            page = self._listing_for(query.get("filter", [""])[0])[offset:offset + limit]
+            return 200, {"responseCode": 200, "content": page, "resultSet": {"offset": offset, "limit": limit, "count": len(page)}}, {}
+        if method == "GET" and parts == ["form", self.form_id]:
+            return 200, {"responseCode": 200, "content": {"id": self.form_id, "count": str(sum(s["status"] == "ACTIVE" for s in self.subs.values()))}}, {}
+        if method == "POST" and parts == ["form", self.form_id, "submissions"]:
+            def add():
+                sid = str(max((int(s) for s in self.subs), default=10**14) + 1)
+                self.subs[sid] = {"id": sid, "form_id": self.form_id, "status": "ACTIVE", "created_at": now, "updated_at": None, "answers": self._answers(form)}
+                return sid
+            sid = self._write(add)
+            return 200, {"responseCode": 200, "content": {"submissionID": sid, "URL": f"{self.form_id}/submissions/{sid}"}}, {}
+        if len(parts) == 2 and parts[0] == "submission" and method in ("POST", "DELETE"):
+            sub = self.subs.get(parts[1])
+            if sub is None: return 404, {"responseCode": 404, "message": "Submission not found"}, {}
+            def change():
+                if method == "DELETE": sub["status"] = "DELETED"
+                else:
+                    for qid, answer in self._answers(form).items():
+                        old = sub["answers"].get(qid, {}).get("answer")
+                        sub["answers"][qid] = {"answer": {**old, **answer["answer"]}} if isinstance(old, dict) and isinstance(answer["answer"], dict) else answer
+                sub["updated_at"] = now
+            self._write(change)
+            message = f"Submission #{parts[1]} deleted successfully." if method == "DELETE" else "Submission updated successfully."
+            return 200, {"responseCode": 200, "content": message}, {}
+        return 404, {"responseCode": 404, "message": f"Unknown endpoint {method} /{path.strip('/')}"}, {}
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like api.jotform.com
+
+        def _respond(self):
+            url = urlsplit(self.path); length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode()) if length else {}
+            status, body, headers = mock.handle(self.command, url.path, parse_qs(url.query), form)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            for k, v in {"Content-Type": "application/json", "Content-Length": str(len(data)), **headers}.items(): self.send_header(k, v)
+            self.end_headers(); self.wfile.write(data)
+
+        do_GET = do_POST = do_DELETE = _respond
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+def serve(mock, host="127.0.0.1", port=0):
+    """Run ``mock`` on a background thread; returns (server, base URL). ``port=0`` picks a free port."""
+    server = ThreadingHTTPServer((host, port), _handler(mock)); server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-jotform", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local JotForm stand-in for the Sales Lead Tracker")
+    parser.add_argument("--count", type=int, default=1000, help="synthetic submissions to serve")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--api-key", default=None, help="reject requests without this apiKey")
+    args = parser.parse_args()
+    mock = MockJotForm(synthetic.submissions(args.count, args.seed), latency=args.latency, error_rate=args.error_rate,
+                       rate_limit=args.rate_limit, api_key=args.api_key, seed=args.seed)
+    server, url = serve(mock, port=args.port)
+    print(f"Mock JotForm serving {args.count} submissions of form '{FORM_ID}' at {url} (Ctrl+C to stop)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
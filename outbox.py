@@ -0,0 +1,179 @@
+# Durable write-behind queue for the Sales Lead Tracker
+# Edits are appended to a JSON-lines outbox and drained to JotForm by a background worker
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import jotform
+
+log = logging.getLogger(__name__)
+
+IDLE_POLL = 5  # seconds between drains when nothing wakes the worker
+MAX_BACKOFF = 60
+MAX_WORKERS = 4
+# Failure text for adds that were being sent when the app stopped: JotForm may or may not have them
+UNCONFIRMED = "interrupted by a restart while it was being sent; it may already be in JotForm"
+
+def is_permanent(error, kind="update"):
+    # 4xx other than 429 will not succeed on retry. An add is not idempotent: unless JotForm cannot have
+    # received it (refused connection, 429), retrying could create a second submission, so it is not retried
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429: return False
+    if kind == "add": return not jotform.unsent(error)
+    return status is not None and 400 <= status < 500
+
+def coalesce(entries):
+    """Fold queued entries for one ticket into a single call: (kind, payload, frame changes)."""
+    kind, payload, changes = "update", {}, {}
+    for e in entries:
+        if e["kind"] == "add": kind, payload = "add", dict(e["payload"])
+        else: payload = {**payload, **e["payload"]}
+        changes.update(e.get("changes") or {})
+    return kind, payload, changes
+
+class Outbox:
+    """Append-only outbox file plus the worker that drains it.
+
+    ``enqueue`` writes one line and returns at once. The worker groups pending
+    entries by SubmissionID, coalesces each group into one call via
+    ``send(kind, sid, payload)`` and appends a ``done`` line for the entries it
+    settled. Entries without a ``done`` line are replayed after a restart,
+    except adds with a ``sending`` line (written before the POST): JotForm may
+    already have them, so they are reported as failures with ``UNCONFIRMED``
+    instead of being sent twice; the updates queued against them are dropped.
+    ``on_done(sid, kind, result, error, changes, target)`` is called once per
+    settled group, with the frame ``changes`` recorded by its entries and the
+    SubmissionID the ticket has on JotForm (an add's new ID). Nothing is sent
+    until ``start`` is called.
+    """
+
+    def __init__(self, path, send, on_done=None, max_workers=MAX_WORKERS):
+        self.path = path; self.send = send; self.on_done = on_done; self.max_workers = max_workers
+        self.pending = {}  # entry id -> entry, in enqueue order
+        self.id_map = {}  # temporary SubmissionID of a queued add -> real SubmissionID
+        self.failures = []  # (entry, error text) for writes JotForm rejected
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._replay()
+
+    def start(self):
+        """Start the background worker; replayed entries are sent right away."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+            self._worker.start(); self._wake.set()
+        return self
+
+    def _replay(self):
+        if not os.path.exists(self.path): return
+        sending = set()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try: record = json.loads(line)
+                except ValueError: continue  # torn last line after a crash
+                if record.get("op") == "enqueue": self.pending[record["id"]] = record
+                elif record.get("op") == "sending": sending.update(record.get("ids", []))
+                elif record.get("op") == "done":
+                    for entry_id in record.get("ids", []): self.pending.pop(entry_id, None)
+                    self.id_map.update(record.get("map") or {})
+        unsure = {e["sid"] for e in self.pending.values() if e["kind"] == "add" and e["id"] in sending}
+        unsure = [e for e in self.pending.values() if e["sid"] in unsure]
+        if unsure:
+            log.warning("Outbox dropping %s writes for adds interrupted while being sent", len(unsure))
+            self._settle([e["id"] for e in unsure]); self.failures += [(e, UNCONFIRMED) for e in unsure if e["kind"] == "add"]
+        if self.pending: log.info("Outbox replaying %s pending writes", len(self.pending))
+
+    def _append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n"); f.flush(); os.fsync(f.fileno())
+
+    def enqueue(self, kind, sid, payload=None, user=None, changes=None):
+        """Queue an ``add`` or ``update``; ``changes`` are the frame values it sets, kept for replay and rollback."""
+        entry = {"op": "enqueue", "id": uuid.uuid4().hex, "kind": kind, "sid": sid, "payload": payload or {}, "changes": changes or {},
+                 "user": user, "ts": time.time()}
+        with self._lock:
+            self._append(entry); self.pending[entry["id"]] = entry
+        self._wake.set()
+        return entry["id"]
+
+    def has_pending(self, sid):
+        with self._lock: return any(e["sid"] == sid or self.id_map.get(e["sid"]) == sid for e in self.pending.values())
+
+    def pending_columns(self, sid):
+        """Frame columns set by the entries still queued for ``sid``."""
+        with self._lock:
+            return {col for e in self.pending.values() if e["sid"] == sid or self.id_map.get(e["sid"]) == sid for col in e.get("changes") or {}}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def take_failures(self, user=None):
+        """Pop the rejected writes enqueued by ``user`` (all users if None)."""
+        with self._lock:
+            mine = [f for f in self.failures if user is None or f[0].get("user") == user]
+            self.failures = [f for f in self.failures if f not in mine]
+            return mine
+
+    def _settle(self, entry_ids, id_map=None):
+        with self._lock:
+            self._append({"op": "done", "ids": entry_ids, "map": id_map or {}})
+            for entry_id in entry_ids: self.pending.pop(entry_id, None)
+            self.id_map.update(id_map or {})
+            if not self.pending:  # compact: nothing left to replay
+                open(self.path, "w").close(); self.id_map.clear()
+
+    def _send_group(self, sid, entries):
+        kind, payload, changes = coalesce(entries); ids = [e["id"] for e in entries]
+        target = self.id_map.get(sid, sid)  # _settle may clear id_map, so resolve it before settling
+        if kind == "add":
+            with self._lock: self._append({"op": "sending", "ids": ids})
+        try:
+            result = self.send(kind, target, payload)
+        except Exception as e:
+            if not is_permanent(e, kind):
+                log.warning("Outbox write for %s failed, will retry: %s", sid, e); return False
+            with self._lock:
+                self._settle(ids); self.failures.append((entries[-1], str(e)))
+            if self.on_done: self.on_done(sid, kind, None, e, changes, target)
+            return True
+        new_sid = ((result or {}).get("content") or {}).get("submissionID") if kind == "add" else None
+        if new_sid: target = str(new_sid)
+        self._settle(ids, {sid: target} if new_sid else None)
+        if self.on_done: self.on_done(sid, kind, result, None, changes, target)
+        return True
+
+    def drain(self):
+        """Send everything queued so far; returns False if any group should be retried."""
+        with self._lock:
+            groups = {}
+            for e in self.pending.values(): groups.setdefault(e["sid"], []).append(e)
+        if not groups: return True
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(groups))) as pool:
+            return all(pool.map(lambda item: self._send_group(*item), groups.items()))
+
+    def _run(self):
+        delay = 0
+        while True:
+            self._wake.wait(timeout=delay or IDLE_POLL); self._wake.clear()
+            try: ok = self.drain()
+            except Exception: log.exception("Outbox drain failed"); ok = False
+            delay = 0 if ok else min(max(delay * 2, 1), MAX_BACKOFF)
+
+def settle(live, box, sid, kind, result, error, changes, target):
+    """``on_done`` for an outbox whose writes were applied optimistically to the TicketCache ``live``.
+
+    A rejected write is undone; while later writes to the ticket are still
+    queued only the columns none of them sets go back, and the ticket stays
+    pending. An accepted write is confirmed (renaming an added ticket to
+    ``target``) once nothing more is queued for the ticket.
+    """
+    if error is not None:
+        if kind != "add" and box.has_pending(target): live.reject(target, changes, box.pending_columns(target))
+        else: live.rollback(target)
+    elif box.has_pending(target): live.accept(sid, changes, target)
+    else: live.confirm(sid, target)
@@ -0,0 +1,185 @@
+# Ticket search for the Sales Lead Tracker
+# In-process inverted index over the free-text fields plus bitmap facets, updated per ticket
+
+import bisect
+import re
+import sys
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+TEXT_FIELDS = ["Name", "Notes", "NextAction", "LostReason"]
+FACETS = ["Status", "TypeOfService", "ContactSource", "AssignedTo"]
+TOKEN = re.compile(r"[a-z0-9]+")
+TYPO_MIN_LENGTH = 4  # shorter terms only match by prefix
+
+def tokens(*texts):
+    return set(TOKEN.findall(" ".join(str(t) for t in texts if isinstance(t, str)).lower()))
+
+def _typo_candidate(word):
+    return len(word) >= TYPO_MIN_LENGTH and word.isalpha()
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def _bitmap(slots, size):
+    # Python ints are the bitmaps: bit i set <=> slot i matches
+    if len(slots) < 64:
+        bits = 0
+        for slot in slots: bits |= 1 << slot
+        return bits
+    flags = np.zeros(size, dtype=bool); flags[list(slots)] = True
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+def _day(value):
+    ts = pd.to_datetime(value, utc=True, errors="coerce") if value is not None else pd.NaT
+    return None if pd.isna(ts) else ts.date()
+
+class SearchIndex:
+    """Inverted index over TEXT_FIELDS and bitmap facets over FACETS and created day.
+
+    Every ticket owns a slot; postings, facet values and created days map to
+    integer bitmaps over the slots, so a query is a handful of AND/OR
+    operations. Terms match words by prefix; alphabetic terms of at least
+    TYPO_MIN_LENGTH letters also match words one edit away (via a
+    delete-neighbourhood map). ``update`` re-indexes one ticket from its old
+    and new row dicts. Updates and queries may run on different threads; they
+    take turns on the index lock.
+    """
+
+    def __init__(self, df):
+        self.sids = []  # slot -> SubmissionID (None once removed)
+        self.slot_of = {}
+        self.postings = {}  # word -> bitmap
+        self.facets = {col: {} for col in FACETS}  # column -> value -> bitmap
+        self.days = {}  # created day -> bitmap
+        self.alive = 0
+        self._vocab = None  # sorted words, rebuilt when words are added
+        self._neighbours = None  # delete variant -> words, built on the first typo lookup
+        self._terms = {}  # term -> bitmap, cleared on every update (search-as-you-type repeats prefixes)
+        self._lock = threading.RLock()
+        self._build(df)
+
+    def _build(self, df):
+        n = len(df); postings = defaultdict(list); facets = {col: defaultdict(list) for col in FACETS}; days = defaultdict(list)
+        text = pd.Series("", index=df.index, dtype=object)
+        for col in TEXT_FIELDS:
+            if col in df.columns: text = text + " " + df[col].astype(object).where(df[col].notna(), "").astype(str)
+        for slot, words in enumerate(text.str.lower().str.findall(TOKEN)):
+            for word in set(words): postings[word].append(slot)
+        for col in FACETS:
+            if col not in df.columns: continue
+            for slot, value in enumerate(df[col].astype(object)):
+                if pd.notna(value): facets[col][value].append(slot)
+        if "CreatedAt" in df.columns:
+            created = pd.to_datetime(df["CreatedAt"], utc=True).dt.date
+            for slot, day in enumerate(created):
+                if pd.notna(day): days[day].append(slot)
+        self.sids = df["SubmissionID"].tolist() if "SubmissionID" in df.columns else list(df.index)
+        self.slot_of = {sid: slot for slot, sid in enumerate(self.sids)}
+        self.postings = {word: _bitmap(slots, n) for word, slots in postings.items()}
+        self.facets = {col: {value: _bitmap(slots, n) for value, slots in values.items()} for col, values in facets.items()}
+        self.days = {day: _bitmap(slots, n) for day, slots in days.items()}
+        self.alive = (1 << n) - 1
+
+    # --- incremental maintenance ---
+    def _keys(self, row):
+        keys = [("word", w) for w in tokens(*(row.get(c) for c in TEXT_FIELDS))]
+        keys += [(col, row.get(col)) for col in FACETS if pd.notna(row.get(col))]
+        day = _day(row.get("CreatedAt"))
+        return keys + ([("day", day)] if day else [])
+
+    def _table(self, kind):
+        return self.postings if kind == "word" else self.days if kind == "day" else self.facets[kind]
+
+    def _flip(self, slot, keys, on):
+        bit = 1 << slot
+        for kind, key in keys:
+            table = self._table(kind)
+            if on:
+                if kind == "word" and key not in table: self._new_word(key)
+                table[key] = table.get(key, 0) | bit
+            elif key in table:
+                table[key] &= ~bit
+                if not table[key]: del table[key]
+
+    def _new_word(self, word):
+        self._vocab = None
+        if self._neighbours is not None and _typo_candidate(word):
+            for variant in _deletes(word) | {word}: self._neighbours[variant].add(word)
+
+    def update(self, old=None, new=None):
+        """Re-index one ticket; ``old``/``new`` are row dicts (None for insert/delete)."""
+        with self._lock:
+            sid = (new or old)["SubmissionID"]
+            slot = self.slot_of.get(sid); self._terms.clear()
+            if slot is None:
+                if new is None: return
+                slot = len(self.sids); self.sids.append(sid); self.slot_of[sid] = slot
+            elif old is not None:
+                self._flip(slot, self._keys(old), False)
+            if new is None:
+                self.alive &= ~(1 << slot); self.sids[slot] = None; del self.slot_of[sid]
+            else:
+                self._flip(slot, self._keys(new), True); self.alive |= 1 << slot
+
+    def rename(self, old_sid, new_sid):
+        with self._lock:
+            slot = self.slot_of.pop(old_sid, None)
+            if slot is not None: self.sids[slot] = new_sid; self.slot_of[new_sid] = slot
+
+    # --- queries ---
+    def _term(self, term):
+        if term in self._terms: return self._terms[term]
+        if self._vocab is None: self._vocab = sorted(self.postings)
+        bits, i = 0, bisect.bisect_left(self._vocab, term)
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            bits |= self.postings.get(self._vocab[i], 0); i += 1
+        if _typo_candidate(term):
+            if self._neighbours is None:
+                self._neighbours = defaultdict(set)
+                for word in filter(_typo_candidate, self.postings):
+                    for variant in _deletes(word) | {word}: self._neighbours[variant].add(word)
+            for variant in _deletes(term) | {term}:
+                for word in self._neighbours.get(variant, ()):
+                    bits |= self.postings.get(word, 0)
+        self._terms[term] = bits
+        return bits
+
+    def match(self, text="", start=None, end=None, **facets):
+        """Bitmap of tickets matching every term of ``text``, created in [start, end] and in the given facet values."""
+        with self._lock:
+            bits = self.alive
+            for term in tokens(text):
+                bits &= self._term(term)
+                if not bits: return 0
+            for col, values in facets.items():
+                if values: bits &= self._any(self.facets[col], values)
+            if start is not None or end is not None:
+                bits &= self._any(self.days, [d for d in self.days if (start is None or d >= start) and (end is None or d <= end)])
+            return bits
+
+    def _any(self, table, keys):
+        bits = 0
+        for key in keys: bits |= table.get(key, 0)
+        return bits
+
+    def search(self, text="", start=None, end=None, **facets):
+        """SubmissionIDs of the matching tickets, in index order."""
+        with self._lock:
+            bits = self.match(text, start, end, **facets)
+            if not bits: return []
+            flags = np.unpackbits(np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8), bitorder="little")
+            return [self.sids[slot] for slot in np.flatnonzero(flags)]
+
+    def memory_usage(self):
+        """Approximate bytes held by the slots, postings, facet and day bitmaps and the typo map."""
+        with self._lock:
+            size = lambda d: sys.getsizeof(d) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in d.items())
+            total = sys.getsizeof(self.sids) + sum(sys.getsizeof(s) for s in self.sids) + size(self.slot_of) + sys.getsizeof(self.alive)
+            total += size(self.postings) + size(self.days) + sum(size(values) for values in self.facets.values())
+            if self._vocab is not None: total += sys.getsizeof(self._vocab)
+            if self._neighbours is not None: total += size(self._neighbours)
+            return total
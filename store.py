@@ -0,0 +1,107 @@
+# Local on-disk ticket store for the Sales Lead Tracker
+# Normalized tickets in SQLite, kept current by incremental JotForm syncs
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import jotform
+
+COLUMNS = jotform.COLUMNS
+UTC_COLUMNS = ["CreatedAt", "LastUpdated"]
+DATE_COLUMNS = ["SurveyScheduledDate", "InstalledDate", "NextActionDate"]
+
+JOTFORM_TS = "%Y-%m-%d %H:%M:%S"
+RECONCILE_EVERY = 3600  # seconds between full downloads that reconcile deleted IDs
+OVERLAP = timedelta(minutes=2)  # re-read a little before the high-water mark; upserts are idempotent
+
+def _sql_value(v):
+    if v is None or (not isinstance(v, (list, dict)) and pd.isna(v)): return None
+    if isinstance(v, pd.Timestamp): return v.isoformat()
+    if isinstance(v, (list, dict)): return json.dumps(v)
+    return str(v)
+
+def _since(hwm):
+    try: return (datetime.strptime(hwm, JOTFORM_TS) - OVERLAP).strftime(JOTFORM_TS)
+    except (TypeError, ValueError): return hwm
+
+class TicketStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        cols = ", ".join(f"{c} TEXT PRIMARY KEY" if c == "SubmissionID" else f"{c} TEXT" for c in COLUMNS)
+        with self._connect() as con:
+            con.execute(f"CREATE TABLE IF NOT EXISTS tickets ({cols})")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def _meta(self, con):
+        return dict(con.execute("SELECT key, value FROM meta").fetchall())
+
+    def _set_meta(self, con, **values):
+        con.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items() if v is not None])
+
+    def _upsert(self, con, df):
+        if df.empty: return
+        rows = [tuple(_sql_value(r.get(c)) for c in COLUMNS) for r in df.to_dict("records")]
+        con.executemany(f"INSERT OR REPLACE INTO tickets ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def is_empty(self):
+        with self._connect() as con:
+            return con.execute("SELECT 1 FROM tickets LIMIT 1").fetchone() is None
+
+    def load(self):
+        with self._connect() as con:
+            df = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM tickets", con)
+        for col in UTC_COLUMNS: df[col] = pd.to_datetime(df[col], utc=True, errors="coerce", format="ISO8601")
+        for col in DATE_COLUMNS: df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+        return df
+
+    def delete(self, submission_ids):
+        with self._connect() as con:
+            con.executemany("DELETE FROM tickets WHERE SubmissionID = ?", [(str(s),) for s in submission_ids])
+
+    def sync(self, fetch, parse, full=False, apply=None):
+        """Bring the store up to date with JotForm.
+
+        ``fetch(params)`` returns raw submissions (``params`` is None for a full
+        download) and ``parse(submissions)`` turns them into the ticket frame.
+        Deltas are pulled with ``created_at``/``updated_at`` filters above the
+        stored high-water marks; a full download replaces the table, which is how
+        submissions deleted outside this app drop out. Once committed,
+        ``apply(rows, removed_ids, full)`` receives what was written, so an
+        in-memory copy can follow without re-reading the table.
+        """
+        with self._lock, self._connect() as con:
+            meta = self._meta(con)
+            full = full or not meta.get("hwm_created") or time.time() - float(meta.get("last_reconcile") or 0) > RECONCILE_EVERY
+            if full:
+                subs = fetch(None)
+            else:
+                subs, seen = [], set()
+                for key in ("created_at", "updated_at"):
+                    since = meta.get(f"hwm_{key}") or meta["hwm_created"]
+                    for sub in fetch({"filter": json.dumps({f"{key}:gt": _since(since)})}):
+                        if sub.get("id") not in seen: seen.add(sub.get("id")); subs.append(sub)
+            active = parse(subs)
+            gone = [str(s.get("id")) for s in subs if s.get("status") != "ACTIVE"]
+            con.execute("BEGIN")
+            if full: con.execute("DELETE FROM tickets")
+            self._upsert(con, active)
+            con.executemany("DELETE FROM tickets WHERE SubmissionID = ?", [(sid,) for sid in gone])
+            created = [s.get("created_at") for s in subs if s.get("created_at")]
+            updated = [s.get("updated_at") for s in subs if s.get("updated_at")] + created
+            self._set_meta(con,
+                hwm_created=max(created + [meta.get("hwm_created") or ""]) or None,
+                hwm_updated=max(updated + [meta.get("hwm_updated") or ""]) or None,
+                last_reconcile=time.time() if full else None, last_sync=time.time())
+            con.execute("COMMIT")
+        if apply is not None: apply(active, gone, full)
+        return {"mode": "full" if full else "delta", "fetched": len(subs), "removed": len(gone)}
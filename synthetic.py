@@ -0,0 +1,86 @@
+# Synthetic JotForm submissions for the Sales Lead Tracker
+# Value pools come from saleslead_seed.csv / sample_tickets.csv; used by mock_jotform.py and bench.py
+
+import os
+import random
+import re
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import config
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED_FILES = [os.path.join(HERE, "saleslead_seed.csv"), os.path.join(HERE, "sample_tickets.csv")]
+REFERENCE = datetime(2025, 10, 20, 12, 0)  # "now" for generated data, so runs are reproducible
+SALES_REPS = ["Alice", "Bob", "Carol", "Dave"]
+NEXT_ACTIONS = ["Call back", "Send quote", "Confirm survey time", "Follow up on install", "Email coverage map"]
+# The normal path through the pipeline; "Waiting on Customer" and "Lost" branch off it
+FLOW = ["Survey Scheduled", "Survey Completed", "Scheduled", "Installed"]
+JOTFORM_TS = "%Y-%m-%d %H:%M:%S"
+
+def load_seed(paths=SEED_FILES):
+    """Value pools for the generator, taken from the seed CSVs that exist (with config fallbacks)."""
+    frames = [pd.read_csv(p, dtype=str) for p in paths if os.path.exists(p)]
+    seed = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    col = lambda *names: pd.concat([seed[n] for n in names if n in seed.columns] or [pd.Series(dtype=object)]).dropna()
+    names = [n.split(" ", 1) for n in col("Name") if " " in n]
+    status_weights = col("Status").value_counts()
+    return {
+        "first": sorted({f for f, _ in names}) or ["Alex"], "last": sorted({l for _, l in names}) or ["Smith"],
+        "sources": sorted(set(col("ContactSource", "Source"))) or ["Email"],
+        "statuses": [s for s in config.STATUS_LIST],
+        "status_weights": [int(status_weights.get(s, 0)) + 1 for s in config.STATUS_LIST],
+        "services": sorted(set(col("TypeOfService"))) or list(config.SERVICE_TYPES),
+        "lost_reasons": sorted(set(col("LostReason"))) or ["Not interested"],
+        "cities": sorted(set(col("City"))) or ["Presque Isle"],
+    }
+
+def status_path(rnd, status):
+    # Statuses a ticket went through to reach ``status``, oldest first
+    if status in FLOW:
+        path = FLOW[:FLOW.index(status) + 1]
+        if len(path) > 1 and rnd.random() < 0.2: path.insert(rnd.randint(1, len(path) - 1), "Waiting on Customer")
+        return path
+    return FLOW[:rnd.randint(1 if status == "Waiting on Customer" else 0, 3)] + [status]
+
+def _jotform_date(d):
+    return {"year": str(d.year), "month": str(d.month), "day": str(d.day)}
+
+def submissions(n, seed=0, pools=None, days=365, now=REFERENCE, start_id=10**14):
+    """``n`` ACTIVE JotForm submissions created over the ``days`` before ``now``.
+
+    Notes carry a newest-first "[YYYY-MM-DD HH:MM] Status → X" line per
+    transition, as status_change_fields writes them, and the survey/install
+    dates match the history.
+    """
+    rnd = random.Random(seed); pools = pools or load_seed(); f = config.FIELD_ID
+    name_qid = re.search(r"\d+", f["name_first"]).group()
+    q = lambda key: str(f[key])
+    out = []
+    for i in range(n):
+        status = rnd.choices(pools["statuses"], pools["status_weights"])[0]
+        first, last = rnd.choice(pools["first"]), rnd.choice(pools["last"])
+        created = now - timedelta(days=rnd.random() * days)
+        path = status_path(rnd, status); ts = created; history = []; reached = {path[0]: created}
+        for s in path[1:]:
+            ts = min(ts + timedelta(hours=rnd.expovariate(1 / 120)), now)
+            history.insert(0, f"[{ts:%Y-%m-%d %H:%M}] Status → {s}"); reached.setdefault(s, ts)
+        body = rnd.choice([f"Lead for {first} {last} in {rnd.choice(pools['cities'])}.", "Customer called in.", "Asked about pricing.", "Left voicemail."])
+        answers = {
+            name_qid: {"answer": {"first": first, "last": last}},
+            q("assigned_to"): {"answer": rnd.choice(SALES_REPS)},
+            q("source"): {"answer": rnd.choice(pools["sources"])},
+            q("status"): {"answer": status},
+            q("service_type"): {"answer": rnd.choice(pools["services"])},
+            q("notes"): {"answer": "\n".join(history + [body])},
+        }
+        if status == "Lost": answers[q("lost_reason")] = {"answer": rnd.choice(pools["lost_reasons"])}
+        if "Survey Scheduled" in reached: answers[q("survey_scheduled_date")] = {"answer": _jotform_date(reached["Survey Scheduled"] + timedelta(days=rnd.randint(1, 10)))}
+        if "Installed" in reached: answers[q("installed_date")] = {"answer": _jotform_date(reached["Installed"])}
+        if status not in ("Installed", "Lost") and rnd.random() < 0.7:
+            answers[q("next_action_date")] = {"answer": _jotform_date(now + timedelta(days=rnd.randint(-14, 14)))}
+            answers[q("next_action")] = {"answer": rnd.choice(NEXT_ACTIONS)}
+        out.append({"id": str(start_id + i), "form_id": "mock", "status": "ACTIVE", "created_at": created.strftime(JOTFORM_TS),
+                    "updated_at": ts.strftime(JOTFORM_TS) if history else None, "answers": answers})
+    return out
@@ -0,0 +1,23 @@
+# Tests for the KPI aggregates
+# Usage: python -m pytest -q
+
+import pandas as pd
+
+import analytics
+import config
+import jotform
+import synthetic
+
+def test_kpi_updates_match_a_rebuild():
+    df = jotform.normalize_submissions(synthetic.submissions(500), config.FIELD_ID)
+    kpis = analytics.KpiAggregates(df)
+    for sid in df["SubmissionID"][:20]:
+        old = df.loc[df["SubmissionID"] == sid].iloc[0].to_dict()
+        new = {**old, "Status": "Installed", "AssignedTo": "New Rep", "InstalledDate": pd.Timestamp("2025-06-01")}
+        kpis.update(old, new); df.loc[df["SubmissionID"] == sid, list(new)] = list(new.values())
+    start = pd.Timestamp(synthetic.REFERENCE, tz="UTC") - pd.Timedelta(days=90)
+    for args, filters in [((), {}), ((start,), {}), ((), {"AssignedTo": "New Rep"})]:
+        got, want = kpis.query(*args, **filters), analytics.KpiAggregates(df).query(*args, **filters)
+        assert (got["total"], got["installed"], got["avg_duration"]) == (want["total"], want["installed"], want["avg_duration"])
+        assert got["status_counts"].to_dict() == want["status_counts"].to_dict()
+        assert got["daily"].equals(want["daily"])
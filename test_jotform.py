@@ -0,0 +1,27 @@
+# Tests for the JotForm client against the local mock server
+# Usage: python -m pytest -q
+
+import threading
+
+import jotform
+import mock_jotform
+import synthetic
+
+def test_fetch_recovers_rows_shifted_by_a_new_submission():
+    # The last page is read first, then a new submission shifts every offset before the middle page is read
+    mock = mock_jotform.MockJotForm(synthetic.submissions(25))
+    handle, shifted = mock.handle, threading.Event()
+    def handle_once(method, path, query, form):
+        offset = query.get("offset", ["0"])[0]
+        if method == "GET" and offset == "10" and not shifted.is_set(): shifted.wait(5)
+        response = handle(method, path, query, form)
+        if method == "GET" and offset == "20" and not shifted.is_set():
+            handle("POST", f"form/{mock.form_id}/submissions", {}, {}); shifted.set()
+        return response
+    mock.handle = handle_once
+    server, url = mock_jotform.serve(mock)
+    try:
+        subs, _ = jotform.JotFormClient("test", base_url=url).fetch_submissions(mock_jotform.FORM_ID, page_size=10)
+    finally:
+        server.shutdown()
+    assert sorted(s["id"] for s in subs) == sorted(mock.subs)
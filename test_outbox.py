@@ -0,0 +1,64 @@
+# Tests for the write-behind outbox
+# Usage: python -m pytest -q
+
+import json
+
+import requests
+
+import outbox
+from test_tickets import ticket_cache
+
+def test_add_confirm_then_edit_uses_real_id(tmp_path):
+    # An add alone in the queue empties the outbox when it settles; the ticket must still get its JotForm ID
+    live = ticket_cache([{"SubmissionID": "1", "Name": "Ada", "AssignedTo": "Bob", "Status": "Lost", "Notes": ""}])
+    sent = []
+    def send(kind, sid, payload):
+        sent.append((kind, sid))
+        return {"content": {"submissionID": 50}} if kind == "add" else {}
+    box = outbox.Outbox(str(tmp_path / "outbox.jsonl"), send, lambda *settled: outbox.settle(live, box, *settled))
+
+    row = {"Name": "Cy", "AssignedTo": "Bob", "Status": "Scheduled", "Notes": ""}
+    live.insert("pending-1", row); box.enqueue("add", "pending-1", {}, changes=row)
+    assert box.drain()
+    assert "50" in live.df.index and "pending-1" not in live.df.index
+    assert not live.is_pending("50")
+    assert live.edit_labels()["Cy · Bob (50)"] == "50"
+
+    live.patch("50", {"Status": "Installed"}); box.enqueue("update", "50", {}, changes={"Status": "Installed"})
+    assert box.drain()
+    assert sent == [("add", "pending-1"), ("update", "50")]
+    assert live.df.loc["50", "Status"] == "Installed" and not live.is_pending("50")
+
+def test_rejected_edit_keeps_later_queued_edit(tmp_path):
+    # The first edit is rejected while a second one is queued: only the columns the second does not set go back
+    live = ticket_cache([{"SubmissionID": "1", "Name": "Ada", "AssignedTo": "Bob", "Status": "Lost", "NextAction": "old", "Notes": ""}])
+    def edit(changes):
+        live.patch("1", changes); box.enqueue("update", "1", {}, changes=changes)
+    def send(kind, sid, payload):
+        if not sent:
+            sent.append(sid); edit({"NextAction": "second"})
+            response = requests.Response(); response.status_code = 400
+            raise requests.HTTPError("400 Bad Request", response=response)
+        sent.append(sid); return {}
+    sent = []
+    box = outbox.Outbox(str(tmp_path / "outbox.jsonl"), send, lambda *settled: outbox.settle(live, box, *settled))
+    edit({"Status": "Installed", "NextAction": "first"})
+    assert box.drain()
+    assert live.df.loc["1", ["Status", "NextAction"]].tolist() == ["Lost", "second"] and live.is_pending("1")
+    assert box.drain() and sent == ["1", "1"]
+    assert live.df.loc["1", ["Status", "NextAction"]].tolist() == ["Lost", "second"] and not live.is_pending("1")
+
+def test_replay_does_not_resend_an_interrupted_add(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    with open(path, "w") as f:
+        for record in [{"op": "enqueue", "id": "a", "kind": "add", "sid": "pending-1", "payload": {}, "changes": {"Name": "Cy"}, "user": "Bob"},
+                       {"op": "sending", "ids": ["a"]},
+                       {"op": "enqueue", "id": "b", "kind": "update", "sid": "pending-1", "payload": {}, "changes": {}, "user": "Bob"},
+                       {"op": "enqueue", "id": "c", "kind": "update", "sid": "7", "payload": {}, "changes": {}, "user": "Bob"}]:
+            f.write(json.dumps(record) + "\n")
+    sent = []
+    box = outbox.Outbox(str(path), lambda kind, sid, payload: sent.append(sid) or {})
+    assert [e["id"] for e, error in box.take_failures("Bob") if error == outbox.UNCONFIRMED] == ["a"]
+    assert list(box.pending) == ["c"]
+    assert box.drain() and sent == ["7"]
+    assert not outbox.Outbox(str(path), None).pending
@@ -0,0 +1,17 @@
+# Tests for the shared ticket frame
+# Usage: python -m pytest -q
+
+import pandas as pd
+
+import tickets
+
+def ticket_cache(rows):
+    live = tickets.TicketCache()
+    live.get(lambda: pd.DataFrame(rows))
+    return live
+
+def test_edit_labels_with_missing_values():
+    live = ticket_cache([{"SubmissionID": "1", "Name": "Ada", "AssignedTo": "Bob", "Notes": ""},
+                         {"SubmissionID": "2", "Name": None, "AssignedTo": "Bob", "Notes": ""}])
+    live.patch("1", {"AssignedTo": None})
+    assert live.edit_labels() == {" · Bob (2)": "2", "Ada · Unassigned (1)": "1"}
@@ -0,0 +1,305 @@
+# Shared in-memory tickets for the Sales Lead Tracker
+# One process-wide DataFrame that writes patch in place instead of forcing a reload
+
+import threading
+import time
+
+import pandas as pd
+
+import analytics
+import config
+import jotform
+import search
+
+# Enumerations stored as categoricals; values outside the known lists are kept as extra categories
+CATEGORIES = {"Status": config.STATUS_LIST, "TypeOfService": config.SERVICE_TYPES, "ContactSource": [], "AssignedTo": []}
+
+def _compact(df):
+    for col, known in CATEGORIES.items():
+        if col in df.columns:
+            values = df[col].astype(object)
+            extra = sorted(set(values.dropna()) - set(known), key=str)
+            df[col] = pd.Categorical(values, categories=list(known) + extra)
+    return df
+
+def _indexed(df):
+    # Index by SubmissionID (keeping the column) so single-ticket reads and writes are hash lookups
+    df = df.set_index(df["SubmissionID"], drop=False) if "SubmissionID" in df.columns else df
+    df.index.name = None
+    return df
+
+def pipeline_columns(df):
+    """Pipeline cards per Status (SubmissionID, Name, AssignedTo), most recently updated first."""
+    ordered = df.sort_values("LastUpdated", ascending=False)
+    return {status: g[["SubmissionID", "Name", "AssignedTo"]].reset_index(drop=True) for status, g in ordered.groupby("Status", sort=False, observed=True)}
+
+class TicketCache:
+    """Process-wide ticket frame shared by every session.
+
+    The frame is indexed by SubmissionID, stores the enumerations as
+    categoricals and keeps the long Notes text in a separate Series that is only
+    joined in for a single ticket (``row``) or on request (``with_notes``), so
+    per-view frames stay small. Writes are applied optimistically and
+    tracked in ``pending`` until JotForm confirms them; pending writes survive a
+    reload and are rolled back on failure. ``version`` changes whenever the
+    frame does. KPI aggregates, the search index and the Edit selector labels
+    are built on demand and kept current as tickets change.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.df = None
+        self.notes = pd.Series(dtype=object)
+        self.version = 0
+        self.loaded_at = 0.0
+        self.pending = {}  # SubmissionID -> ("update", changes) | ("insert", row) | ("delete", None)
+        self._undo = {}  # SubmissionID -> values before its first pending update
+        self._kpis = None
+        self._labels = None
+        self._search = None
+        self.synced_at = 0.0  # last background refresh, successful or not
+        self.sync_error = None
+        self._refreshing = None
+        self._lock = threading.RLock()
+
+    def get(self, loader, refresh=None):
+        """The shared frame, read with ``loader()`` the first time.
+
+        With ``refresh``, once ``ttl`` has passed ``refresh(self)`` runs on a
+        background thread (see ``refresh``) and callers keep the current frame
+        meanwhile; without it the frame is reloaded with ``loader()`` in place.
+        """
+        with self._lock:
+            if self.df is None: self._install(loader())
+            elif refresh is None and time.time() - self.loaded_at > self.ttl: self._install(loader())
+            if refresh is not None and self._refreshing is None and time.time() - self.synced_at > self.ttl:
+                self._refreshing = threading.Thread(target=self.refresh, args=(refresh,), name="ticket-refresh", daemon=True)
+                self._refreshing.start()
+            return self.df
+
+    def refresh(self, refresh):
+        """Run ``refresh(self)`` in this thread without holding the lock; it hands what it fetched to ``merge``."""
+        try:
+            refresh(self); self.sync_error = None
+        except Exception as e:
+            self.sync_error = e
+        finally:
+            with self._lock: self.synced_at = time.time(); self._refreshing = None
+
+    def merge(self, rows, removed=(), full=False):
+        """Apply synced tickets: upsert ``rows`` and drop ``removed`` IDs, or replace every ticket when ``full``."""
+        with self._lock:
+            if self.df is None or (not full and rows.empty and not len(removed)): return
+            if not full:
+                current = self.df.astype({c: object for c in CATEGORIES if c in self.df.columns}).assign(Notes=self.notes)
+                rows = _indexed(rows)
+                rows = pd.concat([current.drop(rows.index.union(pd.Index(removed, dtype=object)), errors="ignore"), rows])
+            self._install(rows)
+
+    def _install(self, df):
+        # New ticket frame: pending writes go back on top and the derived indexes follow the differences
+        old, old_notes = self.df, self.notes
+        df = _compact(_indexed(df))
+        self.notes = df.pop("Notes") if "Notes" in df.columns else pd.Series("", index=df.index, dtype=object)
+        self.df = df
+        for sid, (kind, data) in self.pending.items(): self._reapply(sid, kind, data)
+        if old is not None and (self._search is not None or self._kpis is not None): self._carry(old, old_notes)
+        self.loaded_at = time.time(); self._labels = None; self._bump()
+
+    @property
+    def kpis(self):
+        with self._lock:
+            if self._kpis is None and self.df is not None: self._kpis = analytics.KpiAggregates(self.df)
+            return self._kpis
+
+    def row(self, sid):
+        """One ticket as a Series (Notes included), or None."""
+        df = self.df
+        if df is None or sid not in df.index: return None
+        row = df.loc[sid].copy(); row["Notes"] = self.notes.get(sid, "")
+        return row
+
+    def with_notes(self, frame):
+        """``frame`` (rows of the shared frame) with the Notes column joined back in."""
+        out = frame.assign(Notes=self.notes.reindex(frame.index))
+        return out[[c for c in jotform.COLUMNS if c in out.columns] + [c for c in out.columns if c not in jotform.COLUMNS]]
+
+    @property
+    def search(self):
+        with self._lock:
+            if self._search is None and self.df is not None: self._search = search.SearchIndex(self.with_notes(self.df))
+            return self._search
+
+    def _carry(self, old, old_notes):
+        # Move the search index and KPI buckets across a reload by the tickets it added, removed or
+        # changed (by LastUpdated); drop them for a lazy rebuild if that is most of the tickets
+        new = self.df; common = new.index.intersection(old.index)
+        changed = common[(new.loc[common, "LastUpdated"] != old.loc[common, "LastUpdated"]).to_numpy()]
+        added = new.index.difference(old.index); removed = old.index.difference(new.index)
+        if len(changed) + len(added) + len(removed) > len(new) // 4: self._search = None; self._kpis = None; return
+        before = lambda sid: {**old.loc[sid].to_dict(), "Notes": old_notes.get(sid, "")}
+        for sid in removed: self._track(before(sid), None)
+        for sid in changed: self._track(before(sid), self._get(sid))
+        for sid in added: self._track(None, self._get(sid))
+
+    def memory_usage(self):
+        """Bytes held by the shared dataset, by part."""
+        with self._lock:
+            usage = {"frame": 0, "notes": 0, "kpis": 0, "search": 0}
+            if self.df is not None: usage["frame"] = int(self.df.memory_usage(deep=True).sum())
+            usage["notes"] = int(self.notes.memory_usage(deep=True))
+            if self._kpis is not None: usage["kpis"] = self._kpis.memory_usage()
+            if self._search is not None: usage["search"] = self._search.memory_usage()
+            return usage
+
+    def edit_labels(self):
+        """Ordered ``"Name · AssignedTo (SubmissionID)"`` -> SubmissionID map for the Edit selector."""
+        with self._lock:
+            if self._labels is None: self._build_labels()
+            return self._labels
+
+    def _build_labels(self):
+        names = self.df[["Name", "AssignedTo", "SubmissionID"]].sort_values("Name", kind="stable")
+        # Fill missing values first: astype(str) keeps NaN, and every such label would collapse to one key.
+        # A missing assignee reads 'Unassigned', as on the Pipeline cards
+        name = names["Name"].astype(object).fillna("").astype(str); assigned = names["AssignedTo"].astype(object).fillna("Unassigned").astype(str)
+        labels = name + " · " + assigned + " (" + names["SubmissionID"].astype(str) + ")"
+        self._labels = dict(zip(labels, names["SubmissionID"]))
+
+    def invalidate(self):
+        with self._lock: self.loaded_at = 0.0; self.synced_at = 0.0
+
+    def is_pending(self, sid):
+        return sid in self.pending
+
+    def _bump(self):
+        self.version += 1
+
+    def _track(self, old, new):
+        if self._kpis is not None: self._kpis.update(old, new)
+        if self._search is not None: self._search.update(old, new)
+        if old is None or new is None or any(old.get(c) != new.get(c) for c in ("Name", "AssignedTo", "SubmissionID")):
+            self._labels = None
+
+    def _rows(self, df, sid):
+        return pd.Index([sid]) if df is not None and sid in df.index else pd.Index([])
+
+    def _set(self, rows, values):
+        df = self.df
+        for col, value in values.items():
+            if col == "Notes": self.notes.loc[rows] = value
+            elif col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype) and pd.notna(value) and value not in df[col].cat.categories:
+                    df[col] = df[col].cat.add_categories([value])
+                df.loc[rows, col] = value
+
+    def _get(self, sid):
+        return {**self.df.loc[sid].to_dict(), "Notes": self.notes.get(sid, "")}
+
+    def _append(self, row):
+        row = dict(row); notes = row.pop("Notes", "")
+        new = pd.DataFrame([row], index=[row["SubmissionID"]])
+        self.df = _compact(pd.concat([self.df.astype({c: object for c in CATEGORIES if c in self.df.columns}), new]) if self.df is not None and not self.df.empty else _indexed(new))
+        self.notes = pd.concat([self.notes, pd.Series([notes], index=[row["SubmissionID"]], dtype=object)])
+
+    def _drop(self, rows):
+        self.df = self.df.drop(rows); self.notes = self.notes.drop(rows, errors="ignore")
+
+    def _reapply(self, sid, kind, data):
+        rows = self._rows(self.df, sid)
+        if kind == "update" and len(rows): self._set(rows, data)
+        elif kind == "insert" and not len(rows): self._append(data)
+        elif kind == "delete" and len(rows): self._drop(rows)
+
+    def patch(self, sid, changes):
+        """Apply ``changes`` to one ticket; returns the values needed to roll back, or None if absent."""
+        with self._lock:
+            rows = self._rows(self.df, sid)
+            if not len(rows): return None
+            old = self._get(sid)
+            previous = {c: old[c] for c in changes if c in old}
+            undo = self._undo.setdefault(sid, {})
+            for col, value in previous.items(): undo.setdefault(col, value)
+            self._set(rows, changes)
+            self._track(old, self._get(sid))
+            kind, data = self.pending.get(sid, ("update", {}))
+            self.pending[sid] = (kind, {**data, **changes}) if kind in ("update", "insert") else (kind, data)
+            self._bump()
+            return previous
+
+    def insert(self, sid, row):
+        with self._lock:
+            row = {**row, "SubmissionID": sid}
+            self._append(row)
+            self.pending[sid] = ("insert", row); self._track(None, row); self._bump()
+
+    def remove(self, sid):
+        """Drop one ticket; returns the removed row (as a dict) for rollback."""
+        with self._lock:
+            rows = self._rows(self.df, sid)
+            if not len(rows): return None
+            removed = self._get(sid)
+            self._drop(rows)
+            self.pending[sid] = ("delete", None); self._track(removed, None); self._bump()
+            return removed
+
+    def _rename(self, sid, new_sid):
+        # A queued add got its real SubmissionID
+        self.df = self.df.rename(index={sid: new_sid}); self.notes = self.notes.rename(index={sid: new_sid})
+        self.df.loc[new_sid, "SubmissionID"] = new_sid
+        if sid in self.pending: self.pending[new_sid] = self.pending.pop(sid)
+        if sid in self._undo: self._undo[new_sid] = self._undo.pop(sid)
+        if self._search is not None: self._search.rename(sid, new_sid)
+        self._labels = None; self._bump()
+
+    def confirm(self, sid, new_sid=None):
+        with self._lock:
+            if new_sid is not None and new_sid != sid and sid in self.df.index: self._rename(sid, new_sid)
+            sid = new_sid or sid
+            self.pending.pop(sid, None); self._undo.pop(sid, None)
+
+    def accept(self, sid, changes, new_sid=None):
+        """JotForm took ``changes`` while later writes to the ticket are still queued.
+
+        The ticket stays pending, but a later rollback only goes back to the
+        accepted values; an accepted insert (renamed to ``new_sid``) is no longer
+        dropped on rollback.
+        """
+        with self._lock:
+            if new_sid is not None and new_sid != sid and sid in self.df.index: self._rename(sid, new_sid)
+            sid = new_sid or sid
+            kind, data = self.pending.get(sid, ("update", {}))
+            if kind == "insert": self.pending[sid] = ("update", data)
+            undo = self._undo.get(sid)
+            if undo is not None: undo.update({col: changes[col] for col in undo if col in changes})
+
+    def reject(self, sid, changes, later=()):
+        """JotForm rejected ``changes`` while later writes to the ticket, setting columns ``later``, are still queued.
+
+        Only the columns no later write sets go back to their last accepted
+        values; the ticket stays pending for the later writes.
+        """
+        with self._lock:
+            rows = self._rows(self.df, sid)
+            undo = self._undo.get(sid, {})
+            previous = {col: undo[col] for col in changes if col not in later and col in undo}
+            if not len(rows) or not previous: return
+            current = self._get(sid)
+            self._set(rows, previous); self._track(current, self._get(sid))
+            kind, data = self.pending.get(sid, ("update", {}))
+            if data: self.pending[sid] = (kind, {col: v for col, v in data.items() if col not in previous})
+            self._bump()
+
+    def rollback(self, sid, previous=None):
+        """Undo a pending write; ``previous`` defaults to the values before the ticket's first pending update."""
+        with self._lock:
+            undo = self._undo.pop(sid, None); previous = previous if previous is not None else undo
+            kind, _ = self.pending.pop(sid, ("update", None)); rows = self._rows(self.df, sid)
+            current = self._get(sid) if len(rows) else None
+            if kind == "update" and previous and current is not None:
+                self._set(rows, previous); self._track(current, self._get(sid))
+            elif kind == "insert" and current is not None:
+                self._drop(rows); self._track(current, None)
+            elif kind == "delete" and previous:
+                self._append(previous); self._track(None, previous)
+            self._bump()
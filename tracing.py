@@ -0,0 +1,111 @@
+# Lightweight tracing for the Sales Lead Tracker
+# Timed spans and counters, written to a rotating JSON-lines log and kept in memory for the diagnostics panel
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+RECENT = 5000  # spans kept in memory for percentiles
+
+# Attributes every span started in this context carries (e.g. session, rerun)
+_context = contextvars.ContextVar("trace_context", default={})
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "started")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer; self.name = name; self.attrs = attrs; self.started = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        if self.started is not None:
+            self.tracer.record(self.name, time.perf_counter() - self.started, **self.attrs); self.started = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.started is not None: self.attrs["error"] = exc_type.__name__
+        self.end()
+
+class _NullSpan:
+    # Returned while tracing is off: no clock reads, no allocation per span
+    def set(self, **attrs): pass
+    def end(self): pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+
+NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Spans and counters for one process.
+
+    ``span(name, **attrs)`` times a block (as a context manager, or via
+    ``begin``/``end`` where a block does not fit); finished spans go to the
+    JSON-lines log at ``path`` (rotated at MAX_BYTES) and to a bounded
+    in-memory buffer that ``summary`` turns into p50/p95 per span. When
+    ``enabled`` is False every call returns at once.
+    """
+
+    def __init__(self, path=None, enabled=True, max_bytes=MAX_BYTES, backups=BACKUPS, recent=RECENT):
+        self.enabled = enabled
+        self.recent = deque(maxlen=recent)
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._log = None
+        if path:
+            self._log = logging.getLogger(f"saleslead.trace.{path}"); self._log.propagate = False; self._log.setLevel(logging.INFO)
+            if not self._log.handlers:
+                handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s")); self._log.addHandler(handler)
+
+    def span(self, name, **attrs):
+        return Span(self, name, {**_context.get(), **attrs}) if self.enabled else NULL_SPAN
+
+    begin = span
+
+    def record(self, name, seconds, **attrs):
+        """Add a span timed elsewhere."""
+        if not self.enabled: return
+        entry = {"ts": time.time(), "span": name, "ms": round(seconds * 1000, 3), **attrs}
+        self.recent.append(entry)
+        if self._log: self._log.info(json.dumps(entry, default=str))
+
+    def count(self, name, value=1):
+        if not self.enabled: return
+        with self._lock: self.counters[name] += value
+
+    def summary(self):
+        """Count, p50, p95 and max milliseconds per span over the in-memory buffer."""
+        spans = pd.DataFrame(list(self.recent), columns=["span", "ms"]) if self.recent else pd.DataFrame(columns=["span", "ms"])
+        if spans.empty: return pd.DataFrame(columns=["Span", "Count", "p50 (ms)", "p95 (ms)", "Max (ms)"])
+        grouped = spans.groupby("span")["ms"]
+        out = pd.DataFrame({"Count": grouped.size(), "p50 (ms)": grouped.median(), "p95 (ms)": grouped.quantile(0.95), "Max (ms)": grouped.max()})
+        return out.round(1).sort_values("p95 (ms)", ascending=False).rename_axis("Span").reset_index()
+
+def set_context(**attrs):
+    """Attributes added to every span started later in this thread/context."""
+    _context.set({**_context.get(), **attrs})
+
+TRACER = Tracer(enabled=False)  # off until configure(); library code can call span()/count() regardless
+
+def configure(path=None, enabled=True):
+    global TRACER
+    TRACER = Tracer(path, enabled)
+    return TRACER
+
+def span(name, **attrs):
+    return TRACER.span(name, **attrs)
+
+def count(name, value=1):
+    TRACER.count(name, value)